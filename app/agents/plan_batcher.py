@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any
+
+from app.agents.plan_cache import idea_key
+from app.agents.planner_agent import PlannerAgent
+from app.core.schemas.agent_plan import AgentArchitecturePlan
+
+# How long the first idea of a batch waits for others to arrive (0 disables coalescing)
+_WINDOW_MS = float(os.getenv("PLANNER_COALESCE_MS", "10"))
+
+# Batch is flushed early once this many distinct ideas are waiting
+_MAX_BATCH = int(os.getenv("PLANNER_COALESCE_MAX", "4"))
+
+
+class PlanBatcher:
+    """
+    Coalesces concurrent plan requests into fewer LLM calls.
+
+    Ideas submitted within `window_ms` of the first one are flushed together:
+      - identical ideas already waiting or in flight share one result
+      - a lone idea uses the streaming single-plan path (stops at the closing brace)
+      - several distinct ideas go out as one batched prompt (aplan_batch), so the
+        system prompt/prefill and the HTTP round trip are paid once; if the batched
+        reply doesn't parse, each idea falls back to its own call
+    Must be used from a single event loop (FastAPI's).
+    """
+
+    def __init__(
+        self,
+        agent: PlannerAgent,
+        window_ms: float = _WINDOW_MS,
+        max_batch: int = _MAX_BATCH,
+    ) -> None:
+        self.agent = agent
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending: list[tuple[dict[str, Any], asyncio.Future]] = []
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, idea: dict[str, Any]) -> AgentArchitecturePlan:
+        if self.window == 0:
+            return await self.agent.aplan_streaming(idea)
+
+        cached = await self.agent.acached_plan(idea)
+        if cached is not None:
+            return cached
+
+        key = idea_key(idea)
+        fut = self._inflight.get(key)
+        if fut is None:
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: self._inflight.pop(k, None))
+            self._pending.append((idea, fut))
+
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+
+        # Shielded: a disconnecting client must not cancel a result others wait on
+        return await asyncio.shield(fut)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[dict[str, Any], asyncio.Future]]) -> None:
+        if len(batch) == 1:
+            await self._run_one(*batch[0])
+            return
+
+        try:
+            plans = await self.agent.aplan_batch([idea for idea, _fut in batch])
+        except ValueError:
+            # Batched reply unusable (count/schema mismatch): plan each idea on its own
+            await asyncio.gather(*[self._run_one(idea, fut) for idea, fut in batch])
+            return
+        except Exception as e:
+            for _idea, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_idea, fut), plan in zip(batch, plans):
+            if not fut.done():
+                fut.set_result(plan)
+
+    async def _run_one(self, idea: dict[str, Any], fut: asyncio.Future) -> None:
+        try:
+            plan = await self.agent.aplan_streaming(idea)
+        except Exception as e:
+            if not fut.done():
+                fut.set_exception(e)
+            return
+        if not fut.done():
+            fut.set_result(plan)
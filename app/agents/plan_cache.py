@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+try:
+    import diskcache
+except Exception:  # pragma: no cover
+    diskcache = None  # type: ignore
+
+# Cached plans expire after this many seconds (0 disables expiry)
+_TTL = float(os.getenv("PLANNER_CACHE_TTL", str(7 * 24 * 3600)))
+
+# diskcache evicts least-recently-stored entries beyond this many bytes
+_SIZE_LIMIT = int(os.getenv("PLANNER_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def idea_key(idea: dict[str, Any]) -> str:
+    """Content address for an idea dict (key order independent)."""
+    raw = json.dumps(idea, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def cache_namespace(model: str, *prompts: str) -> str:
+    """
+    Namespace for plans produced by `model` under the given system prompts, so a
+    model or prompt change never serves plans generated by the old one.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    for p in prompts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return f"{model}:{h.hexdigest()}"
+
+
+class PlanCache:
+    """
+    Idea -> serialized AgentArchitecturePlan JSON, within a namespace (model + prompts).
+
+    A per-process LRU dict sits in front of diskcache (shared across uvicorn workers)
+    when that is installed. Entries expire after `ttl` seconds and the disk store is
+    capped at `size_limit` bytes. Async code should use aget()/aset(): they answer
+    from memory when they can and run the SQLite calls in a worker thread.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_items: int = 512,
+        namespace: str = "",
+        ttl: float = _TTL,
+        size_limit: int = _SIZE_LIMIT,
+    ) -> None:
+        directory = directory or os.getenv("PLANNER_CACHE_DIR", "/tmp/planner_cache")
+        self.max_items = max_items
+        self.namespace = namespace
+        self.ttl = ttl if ttl > 0 else None
+        self._disk = (
+            diskcache.Cache(directory, size_limit=size_limit)
+            if diskcache is not None
+            else None
+        )
+        # key -> (expires_at or None, plan_json)
+        self._mem: OrderedDict[str, tuple[float | None, str]] = OrderedDict()
+
+    def get(self, idea: dict[str, Any]) -> str | None:
+        key = self._key(idea)
+        value = self._mem_get(key)
+        if value is None and self._disk is not None:
+            value, ttl_left = self._disk_lookup(key)
+            if value is not None:
+                self._mem_set(key, value, ttl_left)
+        return value
+
+    def set(self, idea: dict[str, Any], plan_json: str) -> None:
+        key = self._key(idea)
+        self._mem_set(key, plan_json, self.ttl)
+        if self._disk is not None:
+            self._disk.set(key, plan_json, expire=self.ttl)
+
+    async def aget(self, idea: dict[str, Any]) -> str | None:
+        key = self._key(idea)
+        value = self._mem_get(key)
+        if value is None and self._disk is not None:
+            value, ttl_left = await asyncio.to_thread(self._disk_lookup, key)
+            if value is not None:
+                self._mem_set(key, value, ttl_left)
+        return value
+
+    async def aset(self, idea: dict[str, Any], plan_json: str) -> None:
+        key = self._key(idea)
+        self._mem_set(key, plan_json, self.ttl)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.set, key, plan_json, expire=self.ttl)
+
+    def _key(self, idea: dict[str, Any]) -> str:
+        return f"{self.namespace}:{idea_key(idea)}" if self.namespace else idea_key(idea)
+
+    def _disk_lookup(self, key: str) -> tuple[str | None, float | None]:
+        # (value, seconds left) so a promoted entry never outlives the disk one;
+        # touches no in-memory state, so it is safe to run in a worker thread
+        value, expire_time = self._disk.get(key, expire_time=True)
+        return value, (expire_time - time.time() if expire_time is not None else None)
+
+    def _mem_get(self, key: str) -> str | None:
+        entry = self._mem.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._mem[key]
+            return None
+        self._mem.move_to_end(key)
+        return value
+
+    def _mem_set(self, key: str, plan_json: str, ttl: float | None) -> None:
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._mem[key] = (expires_at, plan_json)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_items:
+            self._mem.popitem(last=False)
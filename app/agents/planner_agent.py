@@ -1,94 +1,437 @@
 from __future__ import annotations
 
-import json
+import asyncio
+import os
 import re
+from collections.abc import AsyncIterator
 from typing import Any
 
-from pydantic import ValidationError
+import orjson
+from pydantic import TypeAdapter, ValidationError
 
-from app.agents.prompts.planner_prompt import SYSTEM_PROMPT, build_user_prompt
-from app.core.schemas.agent_plan import AgentArchitecturePlan
+from app.agents.plan_cache import PlanCache, cache_namespace
+from app.agents.prompts.planner_prompt import (
+    BATCH_SYSTEM_PROMPT,
+    SYSTEM_PROMPT,
+    build_batched_user_prompt,
+    build_user_prompt,
+)
+from app.core.schemas.agent_plan import AgentArchitecturePlan, ComponentSpec
 from app.services.llm.groq_client import GroqClient
 
-_CODEBLOCK_JSON_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
+# Structural tokens for _extract_and_clean(), scanned in C rather than per character:
+# a whole string literal (closing quote optional so an unterminated string swallows the
+# rest), a brace, or a trailing comma before } / ]
+_JSON_TOKEN_RE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"?|[{}]|,(?=[ \t\r\n]*[}\]])', re.S)
+
+# Validates a whole {"plans": [...]} batch in one pydantic-core call
+_PLAN_LIST_ADAPTER = TypeAdapter(list[AgentArchitecturePlan])
+
+# Upper bound on concurrent LLM calls from aplan()/plan_many() (respect provider rate limits)
+_MAX_PARALLEL = int(os.getenv("PLANNER_MAX_PARALLEL", "8"))
+
+# Ideas packed into one prompt by plan_batch() (larger = fewer calls, slower/longer replies)
+_BATCH_SIZE = int(os.getenv("PLANNER_BATCH_SIZE", "4"))
+
+
+class _StreamingObjectScanner:
+    """
+    String-aware brace tracker fed chunk by chunk.
+    feed() returns the first complete top-level JSON object as soon as it closes;
+    if that turns out not to be the plan (braces in prose), next() resumes after it.
+    Like _load_json(), a ``` fence moves the start to the first "{" inside it.
+    Objects nested directly inside the top-level one are collected in `inner` as
+    (key, text) when they close, keyed by the last top-level key seen (e.g.
+    "components").
+    """
+
+    def __init__(self) -> None:
+        self._parts: list[str] = []
+        self._chunk = ""
+        self._base = 0  # buffer offset of self._chunk
+        self._next = 0  # next index to scan in self._chunk
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._ticks = 0
+        self._fenced = False
+        self._str_start = -1
+        self._key = (0, 0)  # buffer span of the last top-level key
+        self._inner_start = -1
+        self.inner: list[tuple[str, str]] = []
+
+    def feed(self, chunk: str) -> str | None:
+        self._parts.append(chunk)
+        self._base += len(self._chunk)
+        self._chunk = chunk
+        self._next = 0
+        return self.next()
+
+    def next(self) -> str | None:
+        chunk, base = self._chunk, self._base
+        for i in range(self._next, len(chunk)):
+            ch = chunk[i]
+            if ch == "`":
+                self._ticks += 1
+                if self._ticks == 3 and not self._fenced:
+                    # First fence (found as _load_json finds it, strings or not): the
+                    # JSON starts inside it, so drop any candidate opened in prose
+                    self._fenced = True
+                    self._start = -1
+                    self._in_string = self._escape = False
+                    self.inner.clear()
+                if not self._in_string:
+                    continue
+            else:
+                self._ticks = 0
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._str_start != -1:
+                        self._key = (self._str_start + 1, base + i)
+                continue
+
+            if self._start == -1:
+                if ch == "{":
+                    self._start = base + i
+                    self._depth = 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._str_start = base + i if self._depth == 1 else -1
+            elif ch == "{":
+                self._depth += 1
+                if self._depth == 2:
+                    self._inner_start = base + i
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 1:
+                    key = self._slice(*self._key)
+                    self.inner.append((key, self._slice(self._inner_start, base + i + 1)))
+                elif self._depth == 0:
+                    start, self._start = self._start, -1
+                    self._next = i + 1
+                    return self._slice(start, base + i + 1)
+
+        self._next = len(chunk)
+        return None
+
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def _slice(self, start: int, end: int) -> str:
+        # Within the current chunk: slice it directly instead of joining the buffer
+        if start >= self._base:
+            return self._chunk[start - self._base : end - self._base]
+        return self.text()[start:end]
 
 
 class PlannerAgent:
-    def __init__(self, client: GroqClient) -> None:
+    def __init__(self, client: GroqClient, cache: PlanCache | None = None) -> None:
         self.client = client
+        if cache is None:
+            # Plans are only reusable for the same model + prompts
+            namespace = cache_namespace(
+                getattr(client, "model", ""), SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT
+            )
+            cache = PlanCache(namespace=namespace)
+        self.cache = cache
+        self._semaphore = asyncio.Semaphore(max(1, _MAX_PARALLEL))
 
     def plan(self, idea: dict[str, Any]) -> AgentArchitecturePlan:
+        cached = self.cached_plan(idea)
+        if cached is not None:
+            return cached
+
         user_prompt = build_user_prompt(idea)
         raw = self.client.chat(system=SYSTEM_PROMPT, user=user_prompt)
+        return self._store_plan(idea, self._parse_plan(raw))
+
+    async def aplan(self, idea: dict[str, Any]) -> AgentArchitecturePlan:
+        cached = await self.acached_plan(idea)
+        if cached is not None:
+            return cached
+
+        user_prompt = build_user_prompt(idea)
+        async with self._semaphore:
+            raw = await self.client.achat(system=SYSTEM_PROMPT, user=user_prompt)
+        return await self._astore_plan(idea, self._parse_plan(raw))
 
-        json_text = self._extract_json(raw)
-        json_text = self._remove_trailing_commas(json_text)
+    def plan_streaming(self, idea: dict[str, Any]) -> AgentArchitecturePlan:
+        """
+        Like plan(), but consumes the completion as it streams and stops reading
+        as soon as the top-level JSON object closes.
+        """
+        cached = self.cached_plan(idea)
+        if cached is not None:
+            return cached
 
+        user_prompt = build_user_prompt(idea)
+        scanner = _StreamingObjectScanner()
+        stream = self.client.stream_chat(system=SYSTEM_PROMPT, user=user_prompt)
         try:
-            data = json.loads(json_text)
-        except json.JSONDecodeError as e:
+            for piece in stream:
+                plan = self._first_plan(scanner, scanner.feed(piece))
+                if plan is not None:
+                    return self._store_plan(idea, plan)
+        finally:
+            stream.close()
+
+        # Stream ended without a closed object: let the regular extractor report why
+        return self._store_plan(idea, self._parse_plan(scanner.text()))
+
+    async def aplan_streaming(self, idea: dict[str, Any]) -> AgentArchitecturePlan:
+        """Async plan_streaming(): stops the completion once the JSON object closes."""
+        cached = await self.acached_plan(idea)
+        if cached is not None:
+            return cached
+
+        user_prompt = build_user_prompt(idea)
+        scanner = _StreamingObjectScanner()
+        plan: AgentArchitecturePlan | None = None
+        async with self._semaphore:
+            stream = self.client.astream_chat(system=SYSTEM_PROMPT, user=user_prompt)
+            try:
+                async for piece in stream:
+                    plan = self._first_plan(scanner, scanner.feed(piece))
+                    if plan is not None:
+                        break
+            finally:
+                await stream.aclose()
+
+        # No plan-shaped object: let the regular extractor report why
+        return await self._astore_plan(idea, plan or self._parse_plan(scanner.text()))
+
+    async def astream_plan(
+        self, idea: dict[str, Any]
+    ) -> AsyncIterator[tuple[str, ComponentSpec | AgentArchitecturePlan]]:
+        """
+        Streamed plan events: ("component", ComponentSpec) for each component as soon as
+        its object closes in the completion, then ("plan", AgentArchitecturePlan) once the
+        whole plan has been validated (and cached).
+        """
+        cached = await self.acached_plan(idea)
+        if cached is not None:
+            for component in cached.components:
+                yield "component", component
+            yield "plan", cached
+            return
+
+        user_prompt = build_user_prompt(idea)
+        scanner = _StreamingObjectScanner()
+        plan: AgentArchitecturePlan | None = None
+        async with self._semaphore:
+            stream = self.client.astream_chat(system=SYSTEM_PROMPT, user=user_prompt)
+            try:
+                async for piece in stream:
+                    obj_text = scanner.feed(piece)
+                    while True:
+                        for key, text in scanner.inner:
+                            if key != "components":
+                                continue
+                            try:
+                                yield "component", ComponentSpec.model_validate_json(text)
+                            except ValidationError:
+                                pass  # the full-plan validation below reports it
+                        scanner.inner.clear()
+                        if obj_text is None:
+                            break
+                        plan = self._try_parse_plan(obj_text)
+                        if plan is not None:
+                            break
+                        obj_text = scanner.next()
+                    if plan is not None:
+                        break
+            finally:
+                await stream.aclose()
+
+        yield "plan", await self._astore_plan(
+            idea, plan or self._parse_plan(scanner.text())
+        )
+
+    async def plan_many(self, ideas: list[dict[str, Any]]) -> list[AgentArchitecturePlan]:
+        """Plan several ideas with their LLM calls in flight concurrently."""
+        return list(await asyncio.gather(*[self.aplan(i) for i in ideas]))
+
+    def plan_batch(self, ideas: list[dict[str, Any]]) -> list[AgentArchitecturePlan]:
+        """Plan several ideas with one LLM call per PLANNER_BATCH_SIZE ideas."""
+        size = max(1, _BATCH_SIZE)
+        plans: list[AgentArchitecturePlan] = []
+
+        for start in range(0, len(ideas), size):
+            chunk = ideas[start : start + size]
+            raw = self.client.chat(
+                system=BATCH_SYSTEM_PROMPT, user=build_batched_user_prompt(chunk)
+            )
+            plans.extend(self._parse_batch(raw, chunk))
+
+        return plans
+
+    async def aplan_batch(self, ideas: list[dict[str, Any]]) -> list[AgentArchitecturePlan]:
+        """Async plan_batch(): chunks in flight concurrently, results cached per idea."""
+        size = max(1, _BATCH_SIZE)
+
+        async def run(chunk: list[dict[str, Any]]) -> list[AgentArchitecturePlan]:
+            async with self._semaphore:
+                raw = await self.client.achat(
+                    system=BATCH_SYSTEM_PROMPT, user=build_batched_user_prompt(chunk)
+                )
+            return [
+                await self._astore_plan(idea, plan)
+                for idea, plan in zip(chunk, self._parse_batch(raw, chunk))
+            ]
+
+        chunks = [ideas[i : i + size] for i in range(0, len(ideas), size)]
+        results = await asyncio.gather(*[run(c) for c in chunks])
+        return [plan for chunk_plans in results for plan in chunk_plans]
+
+    def _parse_batch(
+        self, raw: str, chunk: list[dict[str, Any]]
+    ) -> list[AgentArchitecturePlan]:
+        data = self._load_json(raw)
+
+        items = data.get("plans") if isinstance(data, dict) else None
+        if not isinstance(items, list) or len(items) != len(chunk):
+            got = len(items) if isinstance(items, list) else 0
+            raise ValueError(
+                f"Expected {len(chunk)} plans from model, got {got}.\n\nData:\n{data}"
+            )
+
+        try:
+            return _PLAN_LIST_ADAPTER.validate_python(items)
+        except ValidationError as e:
+            raise ValueError(
+                f"JSON did not match AgentArchitecturePlan schema:\n{e}\n\nData:\n{data}"
+            )
+
+    def cached_plan(self, idea: dict[str, Any]) -> AgentArchitecturePlan | None:
+        """The cached plan for `idea` (same model + prompts), or None; no LLM call."""
+        plan_json = self.cache.get(idea)
+        if plan_json is None:
+            return None
+        return AgentArchitecturePlan.from_trusted(orjson.loads(plan_json))
+
+    def _store_plan(
+        self, idea: dict[str, Any], plan: AgentArchitecturePlan
+    ) -> AgentArchitecturePlan:
+        self.cache.set(idea, plan.model_dump_json())
+        return plan
+
+    # Event-loop variants: the disk cache is SQLite, so misses/writes go to a thread
+    async def acached_plan(self, idea: dict[str, Any]) -> AgentArchitecturePlan | None:
+        """cached_plan() for the event loop: disk lookups run in a worker thread."""
+        plan_json = await self.cache.aget(idea)
+        if plan_json is None:
+            return None
+        return AgentArchitecturePlan.from_trusted(orjson.loads(plan_json))
+
+    async def _astore_plan(
+        self, idea: dict[str, Any], plan: AgentArchitecturePlan
+    ) -> AgentArchitecturePlan:
+        await self.cache.aset(idea, plan.model_dump_json())
+        return plan
+
+    def _parse_plan(self, raw: str) -> AgentArchitecturePlan:
+        return self._validate(self._load_json(raw))
+
+    def _try_parse_plan(self, raw: str) -> AgentArchitecturePlan | None:
+        try:
+            return self._parse_plan(raw)
+        except ValueError:
+            return None
+
+    def _first_plan(
+        self, scanner: _StreamingObjectScanner, obj_text: str | None
+    ) -> AgentArchitecturePlan | None:
+        """First object the scanner has closed so far (from obj_text on) that is a plan."""
+        while obj_text is not None:
+            plan = self._try_parse_plan(obj_text)
+            if plan is not None:
+                return plan
+            obj_text = scanner.next()  # braces in prose, not the plan: keep scanning
+        return None
+
+    def _load_json(self, raw: str) -> Any:
+        # Fast path: well-formed output is a single object between the first "{"
+        # (inside the fence, if any) and the last "}" -> two C-level finds + one parse.
+        text = (raw or "").strip()
+        fence = text.find("```")
+        start = text.find("{", fence + 3 if fence != -1 else 0)
+        end = text.rfind("}")
+        if start != -1 and end > start:
+            try:
+                return orjson.loads(text[start : end + 1])
+            except orjson.JSONDecodeError:
+                pass
+
+        # Slow path: balanced scan + trailing-comma cleanup
+        json_text = self._extract_and_clean(raw)
+
+        try:
+            data = orjson.loads(json_text)
+        except orjson.JSONDecodeError as e:
             snippet = json_text[:1200]
             raise ValueError(
                 f"Invalid JSON from model: {e}\n\n--- Extracted JSON (trimmed) ---\n{snippet}"
             )
+        return data
 
+    def _validate(self, data: Any) -> AgentArchitecturePlan:
         try:
-            if hasattr(AgentArchitecturePlan, "model_validate"):
-                return AgentArchitecturePlan.model_validate(data)  # pydantic v2
-            return AgentArchitecturePlan(**data)  # pydantic v1 fallback
+            return AgentArchitecturePlan.model_validate(data)
         except ValidationError as e:
             raise ValueError(
                 f"JSON did not match AgentArchitecturePlan schema:\n{e}\n\nData:\n{data}"
             )
 
-    def _extract_json(self, raw: str) -> str:
+    def _extract_and_clean(self, raw: str) -> str:
+        """
+        Single pass over the model output that:
+        - starts inside the first ``` fence when present (prefer fenced JSON),
+        - returns the first balanced JSON object (string-aware),
+        - drops trailing commas before } / ] outside of strings.
+        """
         text = (raw or "").strip()
         if not text:
             raise ValueError("Model returned empty response.")
 
-        # 1) Prefer fenced JSON
-        m = _CODEBLOCK_JSON_RE.search(text)
-        if m:
-            return m.group(1).strip()
-
-        # 2) Otherwise extract first balanced JSON object
-        first = text.find("{")
+        fence = text.find("```")
+        first = text.find("{", fence + 3 if fence != -1 else 0)
+        if first == -1 and fence != -1:
+            first = text.find("{")
         if first == -1:
             raise ValueError(f"Model did not return a JSON object. Raw output:\n{raw}")
 
+        parts: list[str] = []
+        seg_start = first
         depth = 0
-        in_string = False
-        escape = False
-
-        for i in range(first, len(text)):
-            ch = text[i]
-
-            if in_string:
-                if escape:
-                    escape = False
-                elif ch == "\\":
-                    escape = True
-                elif ch == '"':
-                    in_string = False
-                continue
 
+        for m in _JSON_TOKEN_RE.finditer(text, first):
+            ch = text[m.start()]
             if ch == '"':
-                in_string = True
                 continue
-
             if ch == "{":
                 depth += 1
             elif ch == "}":
                 depth -= 1
                 if depth == 0:
-                    return text[first : i + 1].strip()
+                    parts.append(text[seg_start : m.end()])
+                    return "".join(parts).strip()
+            else:
+                # Trailing comma before } / ]
+                parts.append(text[seg_start : m.start()])
+                seg_start = m.end()
 
         raise ValueError(
             "Could not find a complete balanced JSON object in the model output.\n"
             f"Raw output:\n{raw}"
         )
-
-    def _remove_trailing_commas(self, s: str) -> str:
-        s = re.sub(r",\s*}", "}", s)
-        s = re.sub(r",\s*]", "]", s)
-        return s
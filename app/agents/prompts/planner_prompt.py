@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import json
 from typing import Any
 
 SYSTEM_PROMPT = """You are an expert software architect.
@@ -19,26 +20,73 @@ Rules:
 - security must include 3–6 actionable items
 """
 
+BATCH_SYSTEM_PROMPT = """You are an expert software architect.
+Return ONLY valid JSON. No markdown. No backticks. No extra text.
+
+You will receive several projects. For EACH project produce an AgentArchitecturePlan,
+and return them together as:
+{
+  "plans": [
+    {
+      "components": [{"name": "...", "role": "...", "technologies": ["..."]}],
+      "deployment": "...",
+      "scaling": "...",
+      "security": ["..."]
+    }
+  ]
+}
+
+Rules:
+- exactly one plan per project, in the same order as the input
+- components must be 3–6 items
+- technologies must be concrete (e.g., FastAPI, Streamlit, PostgreSQL, Docker, Azure App Service)
+- security must include 3–6 actionable items
+"""
 
-def build_user_prompt(project: dict[str, Any]) -> str:
-    name = project.get("name", "").strip()
-    desc = project.get("description", "").strip()
-    domain = project.get("domain", "").strip()
-    scale = project.get("scale", "").strip()
-    users = project.get("expected_users", None)
-    compliance = project.get("compliance", [])
-    budget = project.get("budget", None)
 
-    return f"""Design an agentic architecture plan for this project.
+# Pre-rendered once; build_user_prompt() only fills the slots.
+_USER_TMPL = """Design an agentic architecture plan for this project.
 
 Project:
 - name: {name}
-- description: {desc}
+- description: {description}
 - domain: {domain}
 - scale: {scale}
-- expected_users: {users}
+- expected_users: {expected_users}
 - compliance: {compliance}
 - budget: {budget}
 
 Return ONLY JSON matching the schema exactly.
 """
+
+
+def _prompt_fields(project: dict[str, Any]) -> dict[str, Any]:
+    """The idea fields both prompt builders render, normalized the same way."""
+    return {
+        "name": (project.get("name") or "").strip(),
+        "description": (project.get("description") or "").strip(),
+        "domain": (project.get("domain") or "").strip(),
+        "scale": (project.get("scale") or "").strip(),
+        "expected_users": project.get("expected_users", None),
+        "compliance": project.get("compliance", []),
+        "budget": project.get("budget", None),
+    }
+
+
+def build_user_prompt(project: dict[str, Any]) -> str:
+    return _USER_TMPL.format_map(_prompt_fields(project))
+
+
+def build_batched_user_prompt(projects: list[dict[str, Any]]) -> str:
+    """Pack several ideas into one prompt so the system prompt/prefill is paid once."""
+    ideas = [_prompt_fields(p) for p in projects]
+    payload = json.dumps({"ideas": ideas}, ensure_ascii=False, indent=2)
+
+    return f"""Design an agentic architecture plan for each of these {len(ideas)} projects.
+
+Projects:
+{payload}
+
+Return ONLY JSON of the form {{"plans": [...]}} with exactly {len(ideas)} plans,
+in the same order as "ideas", each matching the schema exactly.
+"""
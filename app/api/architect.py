@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
-from typing import Any
-
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
-
+import re
+from collections.abc import AsyncIterator
+from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import TYPE_CHECKING
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+
+from app.agents.plan_batcher import PlanBatcher
 from app.agents.planner_agent import PlannerAgent
 from app.core.schemas.agent_plan import AgentArchitecturePlan
 from app.core.schemas.architecture import ArchitecturePlan
@@ -13,49 +23,184 @@ from app.core.schemas.inputs import ProjectIdeaInput
 from app.core.schemas.pipeline import DiagramPipelineRequest, DiagramPipelineResponse
 from app.core.schemas.scaffold import ScaffoldRequest, ScaffoldResponse
 from app.services.diagrams.mermaid_builder import build_mermaid
+from app.services.llm.circuit_breaker import ProviderUnavailable
 from app.services.llm.groq_client import GroqClient
-from app.services.planner.planner_service import ArchitecturePlanner
 from app.services.scaffold.scaffold_generator import generate_repo_scaffold
-from app.services.scaffold.zip_export import build_scaffold_zip_bytes
+from app.services.scaffold.zip_export import stream_scaffold_zip
+
+if TYPE_CHECKING:
+    from app.services.planner.planner_service import ArchitecturePlanner
 
 router = APIRouter(prefix="/architect", tags=["Architecture"])
 
-# Milestone 1: ML-based pattern inference -> ArchitecturePlan
-planner = ArchitecturePlanner()
+# Milestone 1: ML-based pattern inference -> ArchitecturePlan (lazy init)
+_PLANNER: ArchitecturePlanner | None = None
 
-# Milestone 2/3/4: Groq-based planner agent (lazy init)
+# Serializes /preview/batch results in one pydantic-core call
+_PLAN_LIST_ADAPTER = TypeAdapter(list[ArchitecturePlan])
+
+# Milestone 2/3/4: Groq-based planner agent + request coalescer (lazy init)
 _AGENT: PlannerAgent | None = None
+_BATCHER: PlanBatcher | None = None
+
+# Error-message fragments that mean "provider unreachable / unauthorized" (one regex scan)
+_LLM_DOWN_RE = re.compile(
+    "|".join(
+        map(
+            re.escape,
+            (
+                "connection",
+                "refused",
+                "timed out",
+                "timeout",
+                "failed to establish a new connection",
+                "max retries exceeded",
+                "name or service not known",
+                "temporary failure in name resolution",
+                "unauthorized",
+                "invalid api key",
+                "api key",
+                "forbidden",
+                "rate limit",
+                "429",
+            ),
+        )
+    ),
+    re.IGNORECASE,
+)
+
+
+def _json_response(model_obj: BaseModel) -> Response:
+    """
+    Serialize an already-validated model once (pydantic-core JSON) and hand FastAPI
+    the bytes, skipping response_model re-validation + a second JSON encode.
+    The schema stays documented via `responses={200: {"model": ...}}`.
+    """
+    return Response(content=model_obj.model_dump_json(), media_type="application/json")
+
+
+@lru_cache(maxsize=512)
+def _cached_preview_json(idea_json: str) -> tuple[bytes, str]:
+    """
+    /preview body + ETag for an idea, keyed on its JSON dump (fixed field order, so
+    canonical). The planner is deterministic for the process lifetime, so repeat
+    ideas skip the encode + forest pass. Exceptions are not cached.
+    """
+    body = _get_planner().plan(orjson.loads(idea_json)).model_dump_json().encode()
+    return body, _etag(body)
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _etagged_json(body: bytes, etag: str | None = None) -> Response:
+    """
+    JSON response tagged with a content-hash ETag, so clients can tell identical
+    results apart cheaply. No 304 short-circuit: these are POSTs, and RFC 9110 only
+    allows 304 for GET/HEAD (caches won't treat a 304 to a POST as "reuse yours").
+    """
+    return Response(
+        content=body, media_type="application/json", headers={"ETag": etag or _etag(body)}
+    )
 
 
-def _as_dict(model_obj: Any) -> dict[str, Any]:
-    """Pydantic v2 (model_dump) and v1 (dict) compatibility."""
-    if model_obj is None:
-        return {}
-    if hasattr(model_obj, "model_dump"):
-        return model_obj.model_dump(mode="json")
-    return model_obj.dict()
-
-
-def _is_llm_down(msg: str) -> bool:
-    msg = (msg or "").lower()
-    return any(
-        s in msg
-        for s in [
-            "connection",
-            "refused",
-            "timed out",
-            "timeout",
-            "failed to establish a new connection",
-            "max retries exceeded",
-            "name or service not known",
-            "temporary failure in name resolution",
-            "unauthorized",
-            "invalid api key",
-            "api key",
-            "forbidden",
-            "rate limit",
-            "429",
-        ]
+# Stands in for the README's "Generated on" time in cached scaffolds, so a cache hit
+# doesn't hand out the first request's timestamp; _scaffold_for() stamps each response
+_GENERATED_AT_MARK = "\x00generated_at\x00"
+
+
+@lru_cache(maxsize=128)
+def _scaffold_cached(
+    plan_json: str, project_slug: str, include_docker: bool, include_github_actions: bool
+) -> tuple[tuple[str, ...], MappingProxyType[str, str], tuple[str, ...]]:
+    """
+    generate_repo_scaffold() keyed on the plan's JSON + flags, so /scaffold followed
+    by /scaffold/zip for the same plan templates once. Entries are shared between
+    requests, hence the read-only tree/files views. Also returns the paths that
+    carry _GENERATED_AT_MARK.
+    """
+    tree, files = generate_repo_scaffold(
+        plan=AgentArchitecturePlan.model_validate_json(plan_json),
+        project_slug=project_slug,
+        include_docker=include_docker,
+        include_github_actions=include_github_actions,
+        generated_at=_GENERATED_AT_MARK,
+    )
+    stamped = tuple(path for path, content in files.items() if _GENERATED_AT_MARK in content)
+    return tuple(tree), MappingProxyType(files), stamped
+
+
+async def _scaffold_for(
+    plan_json: str, payload: ScaffoldRequest
+) -> tuple[tuple[str, ...], dict[str, str]]:
+    # Templating is CPU-bound; keep it off the event loop so concurrent LLM calls proceed
+    tree, files, stamped = await asyncio.to_thread(
+        _scaffold_cached,
+        plan_json,
+        payload.project_slug,
+        payload.include_docker,
+        payload.include_github_actions,
+    )
+    now = datetime.utcnow().isoformat()
+    out = dict(files)
+    for path in stamped:
+        out[path] = out[path].replace(_GENERATED_AT_MARK, now)
+    return tree, out
+
+
+def _ndjson_line(kind: str, model_obj: BaseModel) -> bytes:
+    return orjson.dumps({"type": kind, "data": orjson.Fragment(model_obj.model_dump_json())}) + b"\n"
+
+
+async def _ndjson_plan_response(idea: ProjectIdeaInput) -> StreamingResponse:
+    """
+    /agent-plan as NDJSON: one {"type": "component"} line per component as the LLM
+    emits it, then the validated {"type": "plan"} line. The first event is awaited
+    here so provider failures still map to 503/500 before the 200 goes out; later
+    failures can only be reported in-band as a {"type": "error"} line.
+    """
+    events = _get_agent().astream_plan(idea.to_prompt_fields())
+    first = await anext(events)
+
+    async def body() -> AsyncIterator[bytes]:
+        try:
+            yield _ndjson_line(*first)
+            async for kind, model_obj in events:
+                yield _ndjson_line(kind, model_obj)
+        except Exception as e:
+            yield orjson.dumps({"type": "error", "detail": str(e)}) + b"\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _api_error(e: Exception) -> Exception:
+    """
+    Exception to raise from an LLM-backed endpoint: HTTPExceptions pass through,
+    provider outages become ProviderUnavailable (503 via provider_unavailable_handler),
+    anything else a 500 carrying the message.
+    """
+    if isinstance(e, (HTTPException, ProviderUnavailable)):
+        return e
+    if _LLM_DOWN_RE.search(str(e)):
+        return ProviderUnavailable(str(e))
+    return HTTPException(status_code=500, detail=str(e))
+
+
+async def provider_unavailable_handler(
+    _request: Request, _exc: ProviderUnavailable
+) -> ORJSONResponse:
+    """App-level handler (registered in app.main) for every provider outage."""
+    return ORJSONResponse(
+        status_code=503,
+        content={
+            "detail": (
+                f"Groq LLM is not reachable/authorized. Tried model={_GROQ_MODEL}. "
+                "Confirm GROQ_API_KEY is set and valid, and that you are not rate-limited."
+            )
+        },
     )
 
 
@@ -63,6 +208,10 @@ def _get_groq_model() -> str:
     return os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
 
 
+# Resolved once at import; the environment is fixed for the container's lifetime
+_GROQ_MODEL = _get_groq_model()
+
+
 def _get_agent() -> PlannerAgent:
     global _AGENT
     if _AGENT is None:
@@ -71,27 +220,44 @@ def _get_agent() -> PlannerAgent:
             raise RuntimeError(
                 "Missing GROQ_API_KEY. Set it as an environment variable in the API app."
             )
-        model = _get_groq_model()
-        groq = GroqClient(api_key=api_key, model=model)
+        groq = GroqClient(api_key=api_key, model=_GROQ_MODEL)
         _AGENT = PlannerAgent(client=groq)
     return _AGENT
 
 
-def _resolve_plan_from_scaffold_payload(
+def _get_planner() -> ArchitecturePlanner:
+    """
+    Build the ML planner on first use. Importing planner_service pulls in
+    sklearn/pandas/treelite (~1 s), so /health and /version don't wait on it.
+    """
+    global _PLANNER
+    if _PLANNER is None:
+        from app.services.planner.planner_service import ArchitecturePlanner
+
+        _PLANNER = ArchitecturePlanner()
+    return _PLANNER
+
+
+def _get_batcher() -> PlanBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        _BATCHER = PlanBatcher(_get_agent())
+    return _BATCHER
+
+
+async def _resolve_plan_from_scaffold_payload(
     payload: ScaffoldRequest,
 ) -> AgentArchitecturePlan:
     """
     Resolve plan from scaffold payload:
     - If payload.plan provided, use it
-    - Else if payload.idea provided, call agent.plan()
+    - Else if payload.idea provided, plan it via the coalescing batcher
     - Else 422
     """
-    agent = _get_agent()
-
     if payload.plan is not None:
         return payload.plan
     if payload.idea is not None:
-        return agent.plan(_as_dict(payload.idea))
+        return await _get_batcher().submit(payload.idea.to_prompt_fields())
 
     raise HTTPException(
         status_code=422,
@@ -99,131 +265,110 @@ def _resolve_plan_from_scaffold_payload(
     )
 
 
-@router.post("/preview", response_model=ArchitecturePlan)
-def preview_architecture(idea: ProjectIdeaInput) -> ArchitecturePlan:
+@router.post("/preview", responses={200: {"model": ArchitecturePlan}})
+def preview_architecture(idea: ProjectIdeaInput) -> Response:
     """Milestone 1: ML model + encoder -> ArchitecturePlan."""
     try:
-        return planner.plan(_as_dict(idea))
+        body, etag = _cached_preview_json(idea.model_dump_json())
+        return _etagged_json(body, etag)
     except FileNotFoundError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/agent-plan", response_model=AgentArchitecturePlan)
-def agent_plan(idea: ProjectIdeaInput) -> AgentArchitecturePlan:
-    """Milestone 2: Groq -> structured AgentArchitecturePlan."""
+@router.post("/preview/batch", responses={200: {"model": list[ArchitecturePlan]}})
+def preview_architecture_batch(ideas: list[ProjectIdeaInput]) -> Response:
+    """Milestone 1 in bulk: one encoder + forest pass for all ideas, plans in input order."""
     try:
-        agent = _get_agent()
-        return agent.plan(_as_dict(idea))
+        plans = _get_planner().plan_many([idea.to_prompt_fields() for idea in ideas])
+        return Response(
+            content=_PLAN_LIST_ADAPTER.dump_json(plans), media_type="application/json"
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        if _is_llm_down(str(e)):
-            model = _get_groq_model()
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"Groq LLM is not reachable/authorized. Tried model={model}. "
-                    "Confirm GROQ_API_KEY is set and valid, and that you are not rate-limited."
-                ),
-            )
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/diagram-from-idea", response_model=DiagramPipelineResponse)
-def diagram_from_idea(payload: DiagramPipelineRequest) -> DiagramPipelineResponse:
-    """Milestone 3: idea -> agent-plan -> mermaid."""
+@router.post("/agent-plan", responses={200: {"model": AgentArchitecturePlan}})
+async def agent_plan(idea: ProjectIdeaInput, request: Request) -> Response:
+    """
+    Milestone 2: Groq -> structured AgentArchitecturePlan.
+    Send `Accept: application/x-ndjson` to receive components as they are generated.
+    """
     try:
-        agent = _get_agent()
+        if "application/x-ndjson" in request.headers.get("accept", ""):
+            return await _ndjson_plan_response(idea)
+        return _json_response(await _get_batcher().submit(idea.to_prompt_fields()))
+    except Exception as e:
+        raise _api_error(e)
 
-        plan = agent.plan(_as_dict(payload.idea))
+
+@router.post("/diagram-from-idea", responses={200: {"model": DiagramPipelineResponse}})
+async def diagram_from_idea(payload: DiagramPipelineRequest) -> Response:
+    """Milestone 3: idea -> agent-plan -> mermaid."""
+    try:
+        plan = await _get_batcher().submit(payload.idea.to_prompt_fields())
         mermaid = build_mermaid(
             plan=plan,
             diagram_type=payload.diagram_type,
             title=payload.title,
         )
 
-        return DiagramPipelineResponse(
-            diagram_type=payload.diagram_type,
-            title=payload.title,
-            mermaid=mermaid,
-            plan=plan,
-            render_url=None,
+        return _json_response(
+            DiagramPipelineResponse(
+                diagram_type=payload.diagram_type,
+                title=payload.title,
+                mermaid=mermaid,
+                plan=plan,
+                render_url=None,
+            )
         )
     except Exception as e:
-        if _is_llm_down(str(e)):
-            model = _get_groq_model()
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"Groq LLM is not reachable/authorized. Tried model={model}. "
-                    "Confirm GROQ_API_KEY is set and valid, and that you are not rate-limited."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
 
 
-@router.post("/scaffold", response_model=ScaffoldResponse)
-def scaffold_repo(payload: ScaffoldRequest) -> ScaffoldResponse:
+@router.post("/scaffold", responses={200: {"model": ScaffoldResponse}})
+async def scaffold_repo(payload: ScaffoldRequest) -> Response:
     """Milestone 4: plan or idea -> repo tree + file contents."""
     try:
-        plan = _resolve_plan_from_scaffold_payload(payload)
-
-        tree, files = generate_repo_scaffold(
-            plan=plan,
-            project_slug=payload.project_slug,
-            include_docker=payload.include_docker,
-            include_github_actions=payload.include_github_actions,
-        )
-
-        return ScaffoldResponse(
-            project_slug=payload.project_slug,
-            tree=tree,
-            files=files,
-            plan=plan,
+        plan = await _resolve_plan_from_scaffold_payload(payload)
+
+        plan_json = plan.model_dump_json()
+        tree, files = await _scaffold_for(plan_json, payload)
+
+        # Serialize straight to bytes: `files` is the largest payload in the system and is
+        # already str -> str, so skip building/validating a ScaffoldResponse around it.
+        body = orjson.dumps(
+            {
+                "project_slug": payload.project_slug,
+                "tree": tree,
+                "files": files,
+                "plan": orjson.Fragment(plan_json),
+            }
         )
+        return _etagged_json(body)
     except Exception as e:
-        if _is_llm_down(str(e)):
-            model = _get_groq_model()
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"Groq LLM is not reachable/authorized. Tried model={model}. "
-                    "Confirm GROQ_API_KEY is set and valid, and that you are not rate-limited."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
 
 
 @router.post("/scaffold/zip", response_class=Response)
-def scaffold_repo_zip(payload: ScaffoldRequest) -> Response:
+async def scaffold_repo_zip(payload: ScaffoldRequest) -> Response:
     """Milestone 4.1: downloadable zip containing the generated scaffold repo."""
     try:
-        plan = _resolve_plan_from_scaffold_payload(payload)
-
-        _tree, files = generate_repo_scaffold(
-            plan=plan,
-            project_slug=payload.project_slug,
-            include_docker=payload.include_docker,
-            include_github_actions=payload.include_github_actions,
-        )
+        plan = await _resolve_plan_from_scaffold_payload(payload)
 
-        zip_bytes = build_scaffold_zip_bytes(files)
+        _tree, files = await _scaffold_for(plan.model_dump_json(), payload)
         filename = f"{payload.project_slug or 'generated_project'}.zip"
 
-        return Response(
-            content=zip_bytes,
+        # Zip is written chunk by chunk as the response is sent (generator runs in
+        # Starlette's threadpool), instead of being built into one bytes object first
+        return StreamingResponse(
+            stream_scaffold_zip(files),
             media_type="application/zip",
             headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
     except Exception as e:
-        if _is_llm_down(str(e)):
-            model = _get_groq_model()
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"Groq LLM is not reachable/authorized. Tried model={model}. "
-                    "Confirm GROQ_API_KEY is set and valid, and that you are not rate-limited."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
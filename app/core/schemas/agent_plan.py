@@ -33,3 +33,15 @@ class AgentArchitecturePlan(BaseModel):
 
         class Config:
             extra = "allow"
+
+    @classmethod
+    def from_trusted(cls, data: dict[str, Any]) -> AgentArchitecturePlan:
+        """
+        Build a plan from data we serialized ourselves (e.g. the plan cache)
+        without re-running validation on every component.
+        """
+        fields = dict(data)
+        fields["components"] = [
+            ComponentSpec.model_construct(**c) for c in (data.get("components") or [])
+        ]
+        return cls.model_construct(**fields)
@@ -1,3 +1,5 @@
+from typing import Any
+
 from pydantic import BaseModel, Field
 
 
@@ -11,3 +13,18 @@ class ProjectIdeaInput(BaseModel):
         default_factory=list, example=["GDPR"]
     )  # optional
     budget: str | None = Field(None, example="low | medium | high")  # optional
+
+    def to_prompt_fields(self) -> dict[str, Any]:
+        """
+        Shallow field dict for the planner prompt/cache key.
+        Same content as model_dump(mode="json") for these flat fields, without the recursive walk.
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "domain": self.domain,
+            "scale": self.scale,
+            "expected_users": self.expected_users,
+            "compliance": self.compliance,
+            "budget": self.budget,
+        }
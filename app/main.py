@@ -1,18 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from app.api.architect import router as architect_router
+from fastapi.responses import ORJSONResponse
+from app.api.architect import provider_unavailable_handler, router as architect_router
+from app.services.llm.circuit_breaker import ProviderUnavailable
+from app.services.llm.groq_client import aclose_http_clients
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    # Shared Groq HTTP pools live for the whole process; release them on shutdown
+    await aclose_http_clients()
+
 
-app = FastAPI(title="AI Architecture Designer ML")
+app = FastAPI(
+    title="AI Architecture Designer ML",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 app.include_router(architect_router)
+# Provider outages (incl. an open circuit breaker) -> 503, raised from any endpoint
+app.add_exception_handler(ProviderUnavailable, provider_unavailable_handler)
 
 @app.get("/")
-def root():
+async def root():
     return {"service": "ai-arch-designer-ml", "status": "ok"}
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "healthy"}
 
 @app.get("/version")
-def version():
+async def version():
     return {"version": "0.1.0"}
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
 import pandas as pd
 
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder
 
+# Fast-path output dtype. Every feature is one-hot (0/1, exact in any float type),
+# and sklearn's trees and treelite both split on float32, so emitting it directly
+# skips a float64 -> float32 copy in front of every forest call.
+_FAST_DTYPE = np.float32
 
 @dataclass
 class FeatureEncoder:
@@ -39,3 +46,52 @@ class FeatureEncoder:
 
     def fit_transform(self, X: pd.DataFrame):
         return self.fit(X).transform(X)
+
+    def transform_record(self, record: dict[str, Any]) -> np.ndarray:
+        """
+        Encode a single dict row without building a DataFrame (inference fast path).
+        Same values as transform(): unknown/missing values encode to all zeros.
+        """
+        index, width = self._category_index()
+        out = np.zeros((1, width), dtype=_FAST_DTYPE)
+        for col, offset, lookup in index:
+            pos = lookup.get(record.get(col))
+            if pos is not None:
+                out[0, offset + pos] = 1.0
+        return out
+
+    def transform_records(self, records: list[dict[str, Any]]) -> np.ndarray:
+        """
+        Vectorized transform_record() for many rows: one category-index lookup pass per
+        column, then a single fancy-index write of the 1s into a preallocated matrix.
+        """
+        index, width = self._category_index()
+        n = len(records)
+        out = np.zeros((n, width), dtype=_FAST_DTYPE)
+        rows = np.arange(n)
+        for col, offset, lookup in index:
+            pos = np.fromiter(
+                (lookup.get(r.get(col), -1) for r in records), dtype=np.int32, count=n
+            )
+            known = pos >= 0
+            out[rows[known], offset + pos[known]] = 1.0
+        return out
+
+    def _category_index(self) -> tuple[list[tuple[str, int, dict[Any, int]]], int]:
+        """(column, offset, category -> position) per fitted column, built once."""
+        cached = getattr(self, "_cat_index", None)
+        if cached is not None:
+            return cached
+
+        if self.transformer is None:
+            raise RuntimeError("FeatureEncoder not fitted. Call fit() first.")
+
+        _name, ohe, cols = self.transformer.transformers_[0]
+        index: list[tuple[str, int, dict[Any, int]]] = []
+        offset = 0
+        for col, cats in zip(cols, ohe.categories_):
+            index.append((col, offset, {c: i for i, c in enumerate(cats.tolist())}))
+            offset += len(cats)
+
+        self._cat_index = (index, offset)
+        return self._cat_index
@@ -2,13 +2,113 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import hashlib
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 import joblib
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 
+try:
+    import treelite
+    import treelite.gtil
+    import treelite.sklearn
+except Exception:  # pragma: no cover
+    treelite = None  # type: ignore
+
+try:
+    import tl2cgen  # optional: compiles the treelite model to a native .so
+except Exception:  # pragma: no cover
+    tl2cgen = None  # type: ignore
+
+
+def artifact_digest(path: str | Path) -> str:
+    """SHA-256 of an artifact file (hashlib.file_digest: C loop, SHA-NI where available)."""
+    with Path(path).open("rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _native_lib_path(model_path: Path) -> Path:
+    # Keyed by model content, so a retrain never picks up a stale library
+    return model_path.with_name(f"{model_path.stem}.{artifact_digest(model_path)[:16]}.so")
+
+
+def _forest_class() -> type:
+    """
+    RandomForestClassifier to train with: Intel oneDAL's (sklearnex) when
+    PATTERN_USE_SKLEARNEX=1 and it is installed, else scikit-learn's.
+    Opt-in because the pickled artifact then references sklearnex, so the API
+    image needs sklearnex installed to load it.
+    """
+    if os.getenv("PATTERN_USE_SKLEARNEX", "0") == "1":
+        try:
+            from sklearnex.ensemble import RandomForestClassifier as OneDALForest
+
+            return OneDALForest
+        except Exception:  # pragma: no cover
+            pass
+    return RandomForestClassifier
+
+
+class _NumpyForest:
+    """
+    The fitted forest flattened into padded (n_trees * max_nodes) numpy arrays and
+    walked level by level for all rows and trees at once: depth iterations of
+    gathers instead of sklearn's per-tree dispatch. Used when treelite is missing.
+    Leaves point at themselves, so extra iterations past a leaf are no-ops.
+
+    Thresholds are stored as float32 rounded *down*: for float32 inputs that gives
+    exactly the same x <= threshold decisions as the float64 originals, and compares
+    without upcasting the gathered row values.
+    """
+
+    def __init__(self, estimators: list[Any]) -> None:
+        trees = [est.tree_ for est in estimators]
+        n_trees = len(trees)
+        width = max(t.node_count for t in trees)
+        n_classes = trees[0].value.shape[-1]
+
+        self.depth = max(t.max_depth for t in trees)
+        self.width = width
+        self.tree_offsets = np.arange(n_trees, dtype=np.intp) * width
+
+        self.feature = np.zeros(n_trees * width, dtype=np.intp)
+        threshold = np.zeros(n_trees * width, dtype=np.float64)
+        self.left = np.zeros(n_trees * width, dtype=np.intp)
+        self.right = np.zeros(n_trees * width, dtype=np.intp)
+        self.value = np.zeros((n_trees * width, n_classes), dtype=np.float64)
+
+        for offset, t in zip(self.tree_offsets, trees):
+            n = t.node_count
+            nodes = np.arange(n, dtype=np.intp)
+            leaf = t.children_left == -1
+            sl = slice(offset, offset + n)
+            self.feature[sl] = np.where(leaf, 0, t.feature)
+            threshold[sl] = t.threshold
+            self.left[sl] = np.where(leaf, nodes, t.children_left) + offset
+            self.right[sl] = np.where(leaf, nodes, t.children_right) + offset
+            # Per-node class fractions, as DecisionTreeClassifier.predict_proba normalizes
+            value = t.value[:, 0, :]
+            total = value.sum(axis=1, keepdims=True)
+            self.value[sl] = value / np.where(total == 0, 1.0, total)
+
+        # Largest float32 <= each threshold: x <= t32 <=> x <= t64 for any float32 x
+        t32 = threshold.astype(np.float32)
+        self.threshold = np.where(t32 > threshold, np.nextafter(t32, np.float32(-np.inf)), t32)
+
+    def predict_proba(self, X: Any) -> np.ndarray:
+        # float32 like sklearn's trees
+        X32 = np.asarray(X, dtype=np.float32)
+        rows = np.arange(X32.shape[0], dtype=np.intp)[:, None]
+        node = np.broadcast_to(self.tree_offsets, (X32.shape[0], len(self.tree_offsets)))
+        for _ in range(self.depth):
+            go_left = X32[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node].mean(axis=1)
+
 
 @dataclass
 class PatternClassifier:
@@ -17,16 +117,27 @@ class PatternClassifier:
 
     Training:
       - defaults to RandomForestClassifier and supports train()
+      - PATTERN_USE_SKLEARNEX=1 trains with the oneDAL-accelerated drop-in instead
 
     Inference:
       - load() a persisted model (.joblib) into self.model
+      - when treelite is installed, load() also imports the forest into treelite and
+        predict()/predict_proba() run through its C++ engine (GTIL) instead of
+        sklearn's per-tree traversal; otherwise they use self.model directly
+      - if compile_native() has built a .so for this exact artifact (tl2cgen), load()
+        uses that straight-line compiled code instead of GTIL
+      - without treelite, load() flattens the forest into numpy arrays (_NumpyForest)
+        so single-row predictions still skip sklearn's per-tree overhead
     """
 
     model: Any | None = None
+    _fast_predictor: Any | None = field(default=None, init=False, repr=False)
+    _native_predictor: Any | None = field(default=None, init=False, repr=False)
+    _numpy_predictor: _NumpyForest | None = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
         if self.model is None:
-            self.model = RandomForestClassifier(
+            self.model = _forest_class()(
                 n_estimators=200,
                 random_state=42,
                 n_jobs=-1,
@@ -40,30 +151,106 @@ class PatternClassifier:
     def predict(self, X: Any) -> Any:
         if self.model is None:
             raise RuntimeError("Model is not loaded/initialized.")
+        if self._fast_predictor is not None or self._numpy_predictor is not None:
+            return self.model.classes_.take(np.argmax(self._fast_proba(X), axis=1))
         return self.model.predict(X)
 
     def predict_proba(self, X: Any) -> Any:
         if self.model is None:
             raise RuntimeError("Model is not loaded/initialized.")
+        if self._fast_predictor is not None or self._numpy_predictor is not None:
+            return self._fast_proba(X)
         if not hasattr(self.model, "predict_proba"):
             raise RuntimeError("Underlying model does not support predict_proba().")
         return self.model.predict_proba(X)
 
-    def save(self, path: str | Path) -> None:
+    def _fast_proba(self, X: Any) -> np.ndarray:
+        if self._fast_predictor is None:
+            return self._numpy_predictor.predict_proba(X)
+        X32 = np.asarray(X, dtype=np.float32)
+        # Both return (n_rows, n_targets, n_classes); single-target classifier
+        if self._native_predictor is not None:
+            out = self._native_predictor.predict(tl2cgen.DMatrix(X32))
+        else:
+            out = treelite.gtil.predict(self._fast_predictor, X32)
+        return out.reshape(X32.shape[0], -1)
+
+    def _compile_fast_predictor(self) -> None:
+        self._fast_predictor = None
+        self._numpy_predictor = None
+        if not hasattr(self.model, "estimators_"):
+            return
+        if treelite is not None:
+            try:
+                self._fast_predictor = treelite.sklearn.import_model(self.model)
+                return
+            except Exception:
+                # Unsupported estimator/treelite version: try the numpy walker
+                self._fast_predictor = None
+        try:
+            self._numpy_predictor = _NumpyForest(self.model.estimators_)
+        except Exception:
+            # Not a plain single-output tree ensemble: keep the sklearn path
+            self._numpy_predictor = None
+
+    def compile_native(self, path: str | Path) -> Path | None:
+        """
+        AOT-compile the forest next to the saved artifact at `path` (needs tl2cgen + a C
+        compiler; takes tens of seconds, so run it at training time, not at startup).
+        Returns the library path, or None when compilation isn't possible here.
+        """
+        if self._fast_predictor is None:
+            self._compile_fast_predictor()
+        if tl2cgen is None or self._fast_predictor is None:
+            return None
+
+        lib = _native_lib_path(Path(path))
+        try:
+            tl2cgen.export_lib(
+                self._fast_predictor,
+                toolchain="gcc",
+                libpath=str(lib),
+                params={"parallel_comp": os.cpu_count() or 1},
+            )
+        except Exception:
+            # No compiler / unsupported model: GTIL remains the fast path
+            return None
+        return lib
+
+    def _load_native_predictor(self, path: Path) -> None:
+        self._native_predictor = None
+        if tl2cgen is None or self._fast_predictor is None:
+            return
+        lib = _native_lib_path(path)
+        if not lib.exists():
+            return
+        try:
+            self._native_predictor = tl2cgen.Predictor(str(lib), nthread=1)
+        except Exception:
+            self._native_predictor = None
+
+    def save(self, path: str | Path, compress: Any = 0) -> None:
+        """
+        Persist with pickle protocol 5. Uncompressed by default: joblib can only
+        mmap_mode-load uncompressed files, and decompression would add to cold start.
+        Pass e.g. compress=("lz4", 3) for a smaller file to ship/archive.
+        """
         if self.model is None:
             raise RuntimeError("Nothing to save. Model is not loaded/initialized.")
         p = Path(path)
         p.parent.mkdir(parents=True, exist_ok=True)
-        joblib.dump(self.model, p)
+        joblib.dump(self.model, p, compress=compress, protocol=5)
 
-    def load(self, path: str | Path) -> None:
+    def load(self, path: str | Path, mmap_mode: str | None = None) -> None:
         p = Path(path)
         if not p.exists():
             raise FileNotFoundError(f"Model file not found: {p}")
-        self.model = joblib.load(p)
+        self.model = joblib.load(p, mmap_mode=mmap_mode)
+        self._compile_fast_predictor()
+        self._load_native_predictor(p)
 
     @classmethod
-    def from_file(cls, path: str | Path) -> PatternClassifier:
+    def from_file(cls, path: str | Path, mmap_mode: str | None = None) -> PatternClassifier:
         inst = cls(model=None)
-        inst.load(path)
+        inst.load(path, mmap_mode=mmap_mode)
         return inst
@@ -54,11 +54,16 @@ def main() -> None:
     # Save model + encoder (needed for inference later)
     MODEL_OUT.parent.mkdir(parents=True, exist_ok=True)
     model.save(str(MODEL_OUT))
-    joblib.dump(encoder, ENCODER_OUT)
+    joblib.dump(encoder, ENCODER_OUT, protocol=5)
 
     print(f"\n✅ Saved model:   {MODEL_OUT}")
     print(f"✅ Saved encoder: {ENCODER_OUT}")
 
+    # Optional: native compiled forest for inference (needs tl2cgen + gcc)
+    native_lib = model.compile_native(MODEL_OUT)
+    if native_lib is not None:
+        print(f"✅ Compiled forest: {native_lib}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+import time
+
+
+class ProviderUnavailable(RuntimeError):
+    """The LLM provider is unreachable, rejecting our credentials, or rate-limiting us."""
+
+
+class CircuitOpenError(ProviderUnavailable):
+    """Raised instead of calling the provider while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker shared by sync and async callers.
+
+    After `fail_max` failures in a row the circuit opens and check() fails fast
+    for `reset_timeout` seconds. After that exactly one caller is let through as
+    a probe while everyone else keeps failing fast: success closes the circuit,
+    failure re-opens it for a full window. A probe that never reports back
+    (cancelled, or an error that says nothing about the provider) holds the slot
+    for at most `reset_timeout`, then the next caller probes instead.
+    """
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 30.0) -> None:
+        self.name = name
+        self.fail_max = max(1, fail_max)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_started: float | None = None
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = time.monotonic()
+            remaining = self.reset_timeout - (now - self._opened_at)
+            if remaining <= 0:
+                probe_busy = (
+                    self._probe_started is not None
+                    and now - self._probe_started < self.reset_timeout
+                )
+                if not probe_busy:
+                    # Half-open: this caller is the single probe
+                    self._probe_started = now
+                    return
+
+        if remaining <= 0:
+            raise CircuitOpenError(
+                f"{self.name} circuit half-open; a probe call is already in flight."
+            )
+        raise CircuitOpenError(
+            f"{self.name} circuit open after {self.fail_max} consecutive failures; "
+            f"skipping call for another {remaining:.0f}s."
+        )
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or self._failures >= self.fail_max:
+                # A failed probe re-opens for a full window
+                self._opened_at = time.monotonic()
+                self._probe_started = None
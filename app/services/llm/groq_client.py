@@ -1,17 +1,138 @@
 from __future__ import annotations
 
-from groq import Groq
+import os
+import threading
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+import groq
+import httpx
+from groq import AsyncGroq, Groq
+
+from app.services.llm.circuit_breaker import CircuitBreaker, ProviderUnavailable
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+
+    _HTTP2 = True
+except Exception:  # pragma: no cover
+    _HTTP2 = False
+
+# Shared, pooled transports: every GroqClient reuses the same keep-alive connections
+# (and multiplexes concurrent calls over one HTTP/2 connection when h2 is installed).
+# keepalive_expiry: httpx drops idle connections after 5s by default, which forces a fresh
+# TLS handshake between sparse LLM calls; keep them for a minute instead.
+_LIMITS = httpx.Limits(
+    max_keepalive_connections=32, max_connections=64, keepalive_expiry=60.0
+)
+# Hard per-call bound so a stalled provider fails fast instead of holding the request
+_REQUEST_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+_TIMEOUT = httpx.Timeout(_REQUEST_TIMEOUT, connect=5.0)
+
+
+def _new_http_clients() -> tuple[httpx.Client, httpx.AsyncClient]:
+    # No sockets are opened until the first request, so building these is cheap
+    return (
+        httpx.Client(
+            transport=httpx.HTTPTransport(http2=_HTTP2, limits=_LIMITS, retries=2),
+            timeout=_TIMEOUT,
+        ),
+        httpx.AsyncClient(
+            transport=httpx.AsyncHTTPTransport(http2=_HTTP2, limits=_LIMITS, retries=2),
+            timeout=_TIMEOUT,
+        ),
+    )
+
+
+_HTTP_CLIENT, _ASYNC_HTTP_CLIENT = _new_http_clients()
+
+# One breaker per process: after LLM_BREAKER_FAIL_MAX consecutive provider failures,
+# calls fail immediately for LLM_BREAKER_RESET seconds instead of piling onto the queue.
+_BREAKER = CircuitBreaker(
+    "Groq",
+    fail_max=int(os.getenv("LLM_BREAKER_FAIL_MAX", "5")),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30")),
+)
+
+# api_key -> (Groq, AsyncGroq) built once per process and shared by every GroqClient
+_SDK_CLIENTS: dict[str, tuple[Groq, AsyncGroq]] = {}
+_SDK_LOCK = threading.Lock()
+
+
+def _sdk_clients(api_key: str) -> tuple[Groq, AsyncGroq]:
+    global _HTTP_CLIENT, _ASYNC_HTTP_CLIENT
+    if _HTTP_CLIENT.is_closed or _ASYNC_HTTP_CLIENT.is_closed:
+        # A finished app lifespan closed the pools (aclose_http_clients); start over
+        with _SDK_LOCK:
+            if _HTTP_CLIENT.is_closed or _ASYNC_HTTP_CLIENT.is_closed:
+                _HTTP_CLIENT, _ASYNC_HTTP_CLIENT = _new_http_clients()
+                _SDK_CLIENTS.clear()
+
+    clients = _SDK_CLIENTS.get(api_key)
+    if clients is None:
+        with _SDK_LOCK:
+            clients = _SDK_CLIENTS.get(api_key)
+            if clients is None:
+                clients = _SDK_CLIENTS[api_key] = (
+                    Groq(api_key=api_key, http_client=_HTTP_CLIENT),
+                    AsyncGroq(api_key=api_key, http_client=_ASYNC_HTTP_CLIENT),
+                )
+    return clients
+
+
+# SDK errors that mean "provider down / refusing us" rather than a bad request
+_UNAVAILABLE_ERRORS: tuple[type[Exception], ...] = (
+    groq.APIConnectionError,  # includes APITimeoutError
+    groq.AuthenticationError,
+    groq.PermissionDeniedError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+)
+
+
+def _request_error(e: Exception) -> RuntimeError:
+    # RuntimeError so the API layer can map it cleanly; ProviderUnavailable -> 503.
+    # Only provider-side failures count toward the breaker: a 400 (e.g. an oversized
+    # prompt) or a local SDK error is the caller's problem, not an outage.
+    if isinstance(e, _UNAVAILABLE_ERRORS):
+        _BREAKER.record_failure()
+        return ProviderUnavailable(f"Groq request failed: {e}")
+    if isinstance(e, groq.APIStatusError):
+        _BREAKER.record_success()  # the provider answered, so it is up
+    return RuntimeError(f"Groq request failed: {e}")
+
+
+async def aclose_http_clients() -> None:
+    """
+    Close the shared connection pools on app shutdown so keep-alive sockets end
+    cleanly. The next GroqClient call builds fresh pools (e.g. after a reload, or a
+    second app lifespan in the same process).
+    """
+    await _ASYNC_HTTP_CLIENT.aclose()
+    _HTTP_CLIENT.close()
 
 
 class GroqClient:
     """
     Minimal Groq client wrapper that matches the interface used by PlannerAgent:
 
-      chat(system: str, user: str, timeout: int = 60) -> str
+      chat(system: str, user: str, timeout: float | None = None) -> str
+      achat(system: str, user: str, timeout: float | None = None) -> str   (async variant)
+      stream_chat(system: str, user: str) -> Iterator[str]     (token deltas)
+      astream_chat(system: str, user: str) -> AsyncIterator[str]   (async variant)
 
     Notes:
-    - The Groq SDK does not expose a requests-style timeout parameter the same way.
-      We keep `timeout` only for compatibility with the rest of the codebase.
+    - `timeout` is passed per request to the SDK; it defaults to LLM_TIMEOUT (30s).
+    - Provider failures (see _UNAVAILABLE_ERRORS, including ones mid-stream) feed a
+      shared circuit breaker; while it is open, calls raise CircuitOpenError without
+      touching the network. Bad requests (4xx) never trip it.
+    - Connection/timeout, auth, rate-limit and 5xx failures raise ProviderUnavailable
+      (the API answers 503); other SDK errors raise RuntimeError.
+    - `achat` uses AsyncGroq (httpx.AsyncClient under the hood) so many plans can be
+      in flight concurrently on one event loop.
+    - Both SDK clients share module-level pooled httpx clients, so the TCP/TLS
+      handshake is paid once per process lifespan rather than once per call; the SDK
+      clients themselves are built once per api_key, so constructing GroqClient is cheap.
     """
 
     def __init__(self, api_key: str, model: str = "llama-3.1-8b-instant") -> None:
@@ -19,37 +140,166 @@ class GroqClient:
         if not api_key:
             raise ValueError("GroqClient: api_key is missing or empty.")
 
-        self.client = Groq(api_key=api_key)
+        self._api_key = api_key
         self.model = (model or "llama-3.1-8b-instant").strip()
 
+    # Looked up per call (a dict hit) rather than held, so a GroqClient that outlives
+    # an app lifespan picks up the rebuilt pools instead of the closed ones
+    @property
+    def client(self) -> Groq:
+        return _sdk_clients(self._api_key)[0]
+
+    @property
+    def aclient(self) -> AsyncGroq:
+        return _sdk_clients(self._api_key)[1]
+
     def chat(
         self,
         system: str,
         user: str,
-        timeout: int = 60,
+        timeout: float | None = None,
         max_tokens: int | None = None,
         temperature: float = 0.2,
     ) -> str:
-        system = (system or "").strip()
-        user = (user or "").strip()
-
-        if not user:
-            raise ValueError("GroqClient.chat: user prompt is empty.")
+        messages = self._messages(system, user)
 
+        _BREAKER.check()
         try:
             resp = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout if timeout is not None else _REQUEST_TIMEOUT,
+            )
+        except Exception as e:
+            raise _request_error(e) from e
+        _BREAKER.record_success()
+
+        return self._content(resp)
+
+    async def achat(
+        self,
+        system: str,
+        user: str,
+        timeout: float | None = None,
+        max_tokens: int | None = None,
+        temperature: float = 0.2,
+    ) -> str:
+        messages = self._messages(system, user)
+
+        _BREAKER.check()
+        try:
+            resp = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=timeout if timeout is not None else _REQUEST_TIMEOUT,
+            )
+        except Exception as e:
+            raise _request_error(e) from e
+        _BREAKER.record_success()
+
+        return self._content(resp)
+
+    def stream_chat(
+        self,
+        system: str,
+        user: str,
+        max_tokens: int | None = None,
+        temperature: float = 0.2,
+    ) -> Iterator[str]:
+        """Yield content deltas as Groq streams them (closing the generator aborts the request)."""
+        messages = self._messages(system, user)
+
+        _BREAKER.check()
+        try:
+            stream = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+        except Exception as e:
+            raise _request_error(e) from e
+
+        with stream:
+            try:
+                for chunk in stream:
+                    choices = getattr(chunk, "choices", None)
+                    if not choices:
+                        continue
+                    delta = getattr(choices[0], "delta", None)
+                    piece = getattr(delta, "content", None)
+                    if piece:
+                        yield piece
+            except GeneratorExit:
+                # Consumer stopped early (e.g. at the plan's closing brace): provider is fine
+                _BREAKER.record_success()
+                raise
+            except Exception as e:
+                # Dropped/timed-out mid-stream: counts toward the breaker too
+                raise _request_error(e) from e
+        # Only a stream read to the end counts as a success
+        _BREAKER.record_success()
+
+    async def astream_chat(
+        self,
+        system: str,
+        user: str,
+        max_tokens: int | None = None,
+        temperature: float = 0.2,
+    ) -> AsyncIterator[str]:
+        """Async stream_chat(): aclose() on the generator aborts the request."""
+        messages = self._messages(system, user)
+
+        _BREAKER.check()
+        try:
+            stream = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=messages,
                 temperature=temperature,
                 max_tokens=max_tokens,
+                stream=True,
             )
         except Exception as e:
-            # Re-raise as RuntimeError so the API layer can map it to 503 cleanly.
-            raise RuntimeError(f"Groq request failed: {e}") from e
+            raise _request_error(e) from e
+
+        async with stream:
+            try:
+                async for chunk in stream:
+                    choices = getattr(chunk, "choices", None)
+                    if not choices:
+                        continue
+                    delta = getattr(choices[0], "delta", None)
+                    piece = getattr(delta, "content", None)
+                    if piece:
+                        yield piece
+            except GeneratorExit:
+                # Consumer stopped early (e.g. at the plan's closing brace): provider is fine
+                _BREAKER.record_success()
+                raise
+            except Exception as e:
+                # Dropped/timed-out mid-stream: counts toward the breaker too
+                raise _request_error(e) from e
+        # Only a stream read to the end counts as a success
+        _BREAKER.record_success()
+
+    def _messages(self, system: str, user: str) -> list[dict[str, str]]:
+        system = (system or "").strip()
+        user = (user or "").strip()
+
+        if not user:
+            raise ValueError("GroqClient.chat: user prompt is empty.")
+
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ]
 
+    def _content(self, resp: Any) -> str:
         # Defensive parsing
         choices = getattr(resp, "choices", None)
         if not choices:
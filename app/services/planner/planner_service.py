@@ -1,12 +1,241 @@
 from __future__ import annotations
 
+import threading
 from pathlib import Path
-from typing import Any
+from typing import Any, ClassVar
 
 import joblib
+import numpy as np
 import pandas as pd
 
 from app.core.schemas.architecture import ArchitecturePlan, DataFlow, ServiceComponent
+from app.ml.models.pattern_classifier import PatternClassifier, artifact_digest
+
+_BASE_RISKS: tuple[str, ...] = (
+    "Requirements drift",
+    "Operational overhead",
+    "Security misconfiguration",
+)
+
+# pattern -> (services, data_flows, storage, pattern-specific risks), built once at import.
+# The components are read-only in responses, so every plan can share these instances.
+_PatternTemplate = tuple[
+    tuple[ServiceComponent, ...], tuple[DataFlow, ...], tuple[str, ...], tuple[str, ...]
+]
+
+_PATTERN_TEMPLATES: dict[str, _PatternTemplate] = {
+    "monolith": (
+        (
+            ServiceComponent(
+                name="app",
+                responsibility="Single deployable API + business logic + ML calls",
+                technologies=["FastAPI", "Python", "SQLite"],
+            ),
+        ),
+        (
+            DataFlow(
+                source="client",
+                destination="app",
+                description="Submit project idea + constraints",
+            ),
+            DataFlow(
+                source="app",
+                destination="storage",
+                description="Persist runs, artifacts, feedback",
+            ),
+        ),
+        ("SQLite",),
+        ("Scaling limits under high concurrency",),
+    ),
+    "microservices": (
+        (
+            ServiceComponent(
+                name="api",
+                responsibility="Request routing, validation, orchestration",
+                technologies=["FastAPI"],
+            ),
+            ServiceComponent(
+                name="ml-service",
+                responsibility="Pattern inference + recommendations",
+                technologies=["Python", "scikit-learn"],
+            ),
+            ServiceComponent(
+                name="artifact-store",
+                responsibility="Store models, outputs, generated scaffolds",
+                technologies=["Local FS (dev)", "Blob Storage (prod)"],
+            ),
+        ),
+        (
+            DataFlow(
+                source="client",
+                destination="api",
+                description="Submit project idea + constraints",
+            ),
+            DataFlow(
+                source="api",
+                destination="ml-service",
+                description="Predict architecture pattern",
+            ),
+            DataFlow(
+                source="api",
+                destination="artifact-store",
+                description="Save generated plans + diagrams",
+            ),
+        ),
+        ("SQLite", "Object Storage"),
+        ("Service-to-service latency", "Deployment complexity"),
+    ),
+    "event-driven": (
+        (
+            ServiceComponent(
+                name="api",
+                responsibility="Accept requests and publish events",
+                technologies=["FastAPI"],
+            ),
+            ServiceComponent(
+                name="worker",
+                responsibility="Async generation: diagrams, scaffolds, evaluations",
+                technologies=["Python", "Celery/RQ (later)"],
+            ),
+            ServiceComponent(
+                name="queue",
+                responsibility="Buffer work and decouple components",
+                technologies=["Redis (dev)", "Azure Service Bus (prod)"],
+            ),
+        ),
+        (
+            DataFlow(
+                source="client",
+                destination="api",
+                description="Submit project idea",
+            ),
+            DataFlow(
+                source="api",
+                destination="queue",
+                description="Publish 'plan_requested' event",
+            ),
+            DataFlow(
+                source="queue",
+                destination="worker",
+                description="Worker consumes and generates outputs",
+            ),
+        ),
+        ("SQLite", "Object Storage"),
+        ("Event ordering/retries", "Observability needed"),
+    ),
+    "serverless": (
+        (
+            ServiceComponent(
+                name="api-functions",
+                responsibility="Stateless endpoints for plan/diagram/scaffold generation",
+                technologies=["Azure Functions (later)", "FastAPI (dev)"],
+            ),
+            ServiceComponent(
+                name="storage",
+                responsibility="Persist artifacts and outputs",
+                technologies=["Blob Storage"],
+            ),
+        ),
+        (
+            DataFlow(
+                source="client",
+                destination="api-functions",
+                description="Submit project idea",
+            ),
+            DataFlow(
+                source="api-functions",
+                destination="storage",
+                description="Store outputs and artifacts",
+            ),
+        ),
+        ("Object Storage",),
+        ("Cold starts", "Vendor lock-in", "Debugging complexity"),
+    ),
+}
+
+_FALLBACK_TEMPLATE: _PatternTemplate = (
+    (
+        ServiceComponent(
+            name="api",
+            responsibility="Plan + generate outputs",
+            technologies=["FastAPI", "Python"],
+        ),
+    ),
+    (
+        DataFlow(
+            source="client",
+            destination="api",
+            description="Submit project idea",
+        ),
+    ),
+    ("SQLite",),
+    ("Unrecognized pattern fallback",),
+)
+
+
+def _template_plan(pattern: str, template: _PatternTemplate) -> ArchitecturePlan:
+    services, flows, storage, pattern_risks = template
+    return ArchitecturePlan(
+        pattern=pattern,
+        pattern_label=None,  # injected later in plan()
+        confidence=None,  # injected later in plan()
+        services=list(services),
+        data_flows=list(flows),
+        storage=list(storage),
+        risks=[*_BASE_RISKS, *pattern_risks],
+    )
+
+
+# Validated once at import; _pattern_to_plan() hands out deep copies
+_PATTERN_PLANS: dict[str, ArchitecturePlan] = {
+    pattern: _template_plan(pattern, template)
+    for pattern, template in _PATTERN_TEMPLATES.items()
+}
+_FALLBACK_PLAN = _template_plan("unknown", _FALLBACK_TEMPLATE)
+
+
+def _feature_row(idea: dict[str, Any]) -> dict[str, Any]:
+    """Idea dict -> one training-feature row (these MUST match training columns exactly)."""
+    raw_users = idea.get("expected_users", 100)
+    if type(raw_users) is int:
+        users = raw_users
+    else:
+        try:
+            users = int(raw_users) if raw_users not in (None, "") else 100
+        except Exception:
+            users = 100
+    if users < 1:
+        users = 1
+
+    compliance = idea.get("compliance")
+    compliance_count = len(compliance) if isinstance(compliance, list) else 0
+
+    return {
+        "domain": (idea.get("domain") or "other"),
+        "scale": (idea.get("scale") or "prototype"),
+        "budget": (idea.get("budget") or "low"),
+        "users": users,
+        "compliance_count": compliance_count,
+    }
+
+
+def _rule_pattern(row: dict[str, Any]) -> str | None:
+    """
+    The deterministic branches of build_dataset.choose_pattern() (the rules that
+    labelled the training data), applied to a _feature_row(). None when the label
+    there was random, i.e. when only the model has an opinion.
+    Keep in sync with app/ml/datasets/build_dataset.py.
+    """
+    scale, budget = row["scale"], row["budget"]
+    if scale == "enterprise" and row["users"] >= 100000:
+        return "event-driven" if budget in ("medium", "high") else "microservices"
+    if budget == "low" and scale == "prototype":
+        return "monolith"
+    if row["domain"] in ("FinTech", "Cybersecurity") and row["compliance_count"] >= 2:
+        return "microservices"
+    if scale == "startup" and budget == "high":
+        return "microservices"
+    return None
 
 
 class ArchitecturePlanner:
@@ -16,15 +245,30 @@ class ArchitecturePlanner:
     Also returns Milestone 6 ML metrics: pattern_label + confidence (0..1).
     """
 
+    # (model sha256, encoder sha256) -> (model, encoder), shared by every instance in the
+    # process. Keyed on content, so copies/re-saves of the same artifacts load only once.
+    _SHARED: ClassVar[dict[tuple[str, str], tuple[PatternClassifier, Any]]] = {}
+    _SHARED_LOCK: ClassVar[threading.Lock] = threading.Lock()
+
     def __init__(
         self,
         model_path: str = "artifacts/models/pattern_model.joblib",
         encoder_path: str = "artifacts/models/pattern_encoder.joblib",
+        use_fast_encode: bool = True,
+        use_rules: bool = True,
     ) -> None:
         self.model_path = Path(model_path)
         self.encoder_path = Path(encoder_path)
+        # False = encode through a one-row DataFrame + encoder.transform (schema-drift escape hatch)
+        self.use_fast_encode = use_fast_encode
+        # True = ideas the dataset rules decide are answered without the model (confidence 1.0)
+        self.use_rules = use_rules
         self._model = None
         self._encoder = None
+        # Resolved once in _load_artifacts() so plan() does no hasattr/try per request
+        self._predict = None
+        self._predict_proba = None
+        self._classes = None
 
     def _load_artifacts(self) -> None:
         if self._model is not None and self._encoder is not None:
@@ -42,64 +286,127 @@ class ArchitecturePlanner:
                 "Run: python -m app.ml.training.train_pattern"
             )
 
-        self._model = joblib.load(self.model_path)
-        self._encoder = joblib.load(self.encoder_path)
+        key = (artifact_digest(self.model_path), artifact_digest(self.encoder_path))
+        with self._SHARED_LOCK:
+            shared = self._SHARED.get(key)
+            if shared is None:
+                shared = self._SHARED[key] = self._read_artifacts()
+        self._model, self._encoder = shared
+
+        self._predict = self._model.predict
+        self._classes = getattr(self._model.model, "classes_", None)
+        if self._classes is not None and hasattr(self._model.model, "predict_proba"):
+            self._predict_proba = self._model.predict_proba
+
+    def _read_artifacts(self) -> tuple[PatternClassifier, Any]:
+        # mmap_mode="r": large arrays are read as file views (page cache) instead of
+        # being unpickled into a heap copy first.
+        # PatternClassifier compiles the forest to treelite when available.
+        model = PatternClassifier.from_file(self.model_path, mmap_mode="r")
+        encoder = joblib.load(self.encoder_path, mmap_mode="r")
+
+        # Warm-up inference so the first request doesn't pay lazy init / cold pages
+        n_features = getattr(model.model, "n_features_in_", None)
+        if n_features:
+            model.predict_proba(np.zeros((1, n_features)))
+
+        return model, encoder
 
     def plan(self, idea: dict[str, Any]) -> ArchitecturePlan:
         """
         idea: dict version of ProjectIdeaInput.
         Returns: ArchitecturePlan (Pydantic model) incl. ML metrics.
         """
-        self._load_artifacts()
+        row = _feature_row(idea)
 
-        # These MUST match training feature columns exactly
-        raw_users = idea.get("expected_users", 100)
-        try:
-            users = int(raw_users) if raw_users not in (None, "") else 100
-        except Exception:
-            users = 100
-        if users < 1:
-            users = 1
-
-        compliance = idea.get("compliance") or []
-        if not isinstance(compliance, list):
-            compliance = []
-        compliance_count = len(compliance)
-
-        X = pd.DataFrame(
-            [
-                {
-                    "domain": (idea.get("domain") or "other"),
-                    "scale": (idea.get("scale") or "prototype"),
-                    "budget": (idea.get("budget") or "low"),
-                    "users": users,
-                    "compliance_count": compliance_count,
-                }
-            ]
-        )
+        if self.use_rules:
+            rule_label = _rule_pattern(row)
+            if rule_label is not None:
+                return self._labelled_plan(rule_label, 1.0, idea)
 
-        X_enc = self._encoder.transform(X)
+        self._load_artifacts()
 
-        # ---- Prediction + confidence (Milestone 6) ----
-        pred = self._model.predict(X_enc)[0]
-        pattern_label = str(pred)
+        if self.use_fast_encode:
+            # Direct one-hot into a preallocated row via the fitted category index
+            X_enc = self._encoder.transform_record(row)
+        else:
+            X_enc = self._encoder.transform(pd.DataFrame([row]))
 
+        # ---- Prediction + confidence (Milestone 6) ----
+        # One forest pass: the label is argmax(proba), exactly what the forest's predict() does
         confidence: float | None = None
-        if hasattr(self._model, "predict_proba"):
-            try:
-                proba = self._model.predict_proba(X_enc)
-                if proba is not None and len(proba) > 0:
-                    confidence = float(max(proba[0]))
-            except Exception:
-                confidence = None
-
-        # Build the plan with your existing mapping
-        plan = self._pattern_to_plan(pattern_label, idea)
+        if self._predict_proba is not None:
+            proba = self._predict_proba(X_enc)[0]
+            best = int(np.argmax(proba))
+            pattern_label = str(self._classes[best])
+            confidence = float(proba[best])
+        else:
+            pattern_label = str(self._predict(X_enc)[0])
 
-        # Inject ML metrics
+        return self._labelled_plan(pattern_label, confidence, idea)
+
+    def plan_many(self, ideas: list[dict[str, Any]]) -> list[ArchitecturePlan]:
+        """
+        Bulk plan(): rule hits first, then one feature matrix and one forest pass for
+        the rest, instead of a 1-row prediction per idea. Model labels are
+        argmax(predict_proba), as in predict().
+        """
+        if not ideas:
+            return []
+
+        rows = [_feature_row(idea) for idea in ideas]
+        labels: list[str | None] = [None] * len(rows)
+        confidences: list[float | None] = [None] * len(rows)
+        if self.use_rules:
+            for i, row in enumerate(rows):
+                rule_label = _rule_pattern(row)
+                if rule_label is not None:
+                    labels[i], confidences[i] = rule_label, 1.0
+
+        # Model pass only over the ideas the rules left open
+        todo = [i for i, label in enumerate(labels) if label is None]
+        if todo:
+            self._predict_rows([rows[i] for i in todo], todo, labels, confidences)
+
+        return [
+            self._labelled_plan(str(label), confidence, idea)
+            for idea, label, confidence in zip(ideas, labels, confidences)
+        ]
+
+    def _predict_rows(
+        self,
+        rows: list[dict[str, Any]],
+        positions: list[int],
+        labels: list[str | None],
+        confidences: list[float | None],
+    ) -> None:
+        """One encoder + forest pass over `rows`; results written at `positions`."""
+        self._load_artifacts()
+        if self.use_fast_encode:
+            X_enc = self._encoder.transform_records(rows)
+        else:
+            X_enc = self._encoder.transform(pd.DataFrame(rows))
+
+        if self._predict_proba is not None:
+            proba = self._predict_proba(X_enc)
+            best = np.argmax(proba, axis=1)
+            for pos, label, confidence in zip(
+                positions,
+                self._classes.take(best).tolist(),
+                proba[np.arange(len(rows)), best].tolist(),
+            ):
+                labels[pos], confidences[pos] = label, confidence
+        else:
+            for pos, label in zip(positions, self._predict(X_enc).tolist()):
+                labels[pos] = label
+
+    def _labelled_plan(
+        self, pattern_label: str, confidence: float | None, idea: dict[str, Any]
+    ) -> ArchitecturePlan:
+        # Build the plan with your existing mapping, then inject ML metrics
+        plan = self._pattern_to_plan(pattern_label, idea)
         plan.pattern_label = pattern_label
         plan.confidence = confidence
-
         return plan
 
     def _pattern_to_plan(self, pattern: str, idea: dict[str, Any]) -> ArchitecturePlan:
@@ -107,169 +414,17 @@ class ArchitecturePlanner:
         scale = (idea.get("scale") or "prototype").strip()
         budget = (idea.get("budget") or "low").strip()
 
-        base_risks: list[str] = [
-            "Requirements drift",
-            "Operational overhead",
-            "Security misconfiguration",
-        ]
-
-        if pattern == "monolith":
-            services = [
-                ServiceComponent(
-                    name="app",
-                    responsibility="Single deployable API + business logic + ML calls",
-                    technologies=["FastAPI", "Python", "SQLite"],
-                )
-            ]
-            flows = [
-                DataFlow(
-                    source="client",
-                    destination="app",
-                    description="Submit project idea + constraints",
-                ),
-                DataFlow(
-                    source="app",
-                    destination="storage",
-                    description="Persist runs, artifacts, feedback",
-                ),
-            ]
-            storage = ["SQLite"]
-            risks = base_risks + ["Scaling limits under high concurrency"]
-
-        elif pattern == "microservices":
-            services = [
-                ServiceComponent(
-                    name="api",
-                    responsibility="Request routing, validation, orchestration",
-                    technologies=["FastAPI"],
-                ),
-                ServiceComponent(
-                    name="ml-service",
-                    responsibility="Pattern inference + recommendations",
-                    technologies=["Python", "scikit-learn"],
-                ),
-                ServiceComponent(
-                    name="artifact-store",
-                    responsibility="Store models, outputs, generated scaffolds",
-                    technologies=["Local FS (dev)", "Blob Storage (prod)"],
-                ),
-            ]
-            flows = [
-                DataFlow(
-                    source="client",
-                    destination="api",
-                    description="Submit project idea + constraints",
-                ),
-                DataFlow(
-                    source="api",
-                    destination="ml-service",
-                    description="Predict architecture pattern",
-                ),
-                DataFlow(
-                    source="api",
-                    destination="artifact-store",
-                    description="Save generated plans + diagrams",
-                ),
-            ]
-            storage = ["SQLite", "Object Storage"]
-            risks = base_risks + ["Service-to-service latency", "Deployment complexity"]
-
-        elif pattern == "event-driven":
-            services = [
-                ServiceComponent(
-                    name="api",
-                    responsibility="Accept requests and publish events",
-                    technologies=["FastAPI"],
-                ),
-                ServiceComponent(
-                    name="worker",
-                    responsibility="Async generation: diagrams, scaffolds, evaluations",
-                    technologies=["Python", "Celery/RQ (later)"],
-                ),
-                ServiceComponent(
-                    name="queue",
-                    responsibility="Buffer work and decouple components",
-                    technologies=["Redis (dev)", "Azure Service Bus (prod)"],
-                ),
-            ]
-            flows = [
-                DataFlow(
-                    source="client",
-                    destination="api",
-                    description="Submit project idea",
-                ),
-                DataFlow(
-                    source="api",
-                    destination="queue",
-                    description="Publish 'plan_requested' event",
-                ),
-                DataFlow(
-                    source="queue",
-                    destination="worker",
-                    description="Worker consumes and generates outputs",
-                ),
-            ]
-            storage = ["SQLite", "Object Storage"]
-            risks = base_risks + ["Event ordering/retries", "Observability needed"]
-
-        elif pattern == "serverless":
-            services = [
-                ServiceComponent(
-                    name="api-functions",
-                    responsibility="Stateless endpoints for plan/diagram/scaffold generation",
-                    technologies=["Azure Functions (later)", "FastAPI (dev)"],
-                ),
-                ServiceComponent(
-                    name="storage",
-                    responsibility="Persist artifacts and outputs",
-                    technologies=["Blob Storage"],
-                ),
-            ]
-            flows = [
-                DataFlow(
-                    source="client",
-                    destination="api-functions",
-                    description="Submit project idea",
-                ),
-                DataFlow(
-                    source="api-functions",
-                    destination="storage",
-                    description="Store outputs and artifacts",
-                ),
-            ]
-            storage = ["Object Storage"]
-            risks = base_risks + [
-                "Cold starts",
-                "Vendor lock-in",
-                "Debugging complexity",
-            ]
-
-        else:
-            services = [
-                ServiceComponent(
-                    name="api",
-                    responsibility="Plan + generate outputs",
-                    technologies=["FastAPI", "Python"],
-                )
-            ]
-            flows = [
-                DataFlow(
-                    source="client",
-                    destination="api",
-                    description="Submit project idea",
-                )
-            ]
-            storage = ["SQLite"]
-            risks = base_risks + ["Unrecognized pattern fallback"]
-
-        risks.append(f"Context: domain={domain}, scale={scale}, budget={budget}")
-
-        return ArchitecturePlan(
-            pattern=pattern,  # keep existing behavior
-            pattern_label=None,  # injected later in plan()
-            confidence=None,  # injected later in plan()
-            services=services,
-            data_flows=flows,
-            storage=storage,
-            risks=risks,
+        # Deep copy of the prebuilt plan: only the context risk line is new, and
+        # model_copy(update=...) doesn't re-validate the static parts. Deep, so a
+        # caller that edits its plan (or a component in it) can't touch the template.
+        base = _PATTERN_PLANS.get(pattern, _FALLBACK_PLAN)
+        return base.model_copy(
+            update={
+                "pattern": pattern,  # keep existing behavior
+                "risks": [
+                    *base.risks,
+                    f"Context: domain={domain}, scale={scale}, budget={budget}",
+                ],
+            },
+            deep=True,
         )
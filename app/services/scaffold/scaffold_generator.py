@@ -15,10 +15,12 @@ def _normalize_slug(slug: str) -> str:
     """
     slug = (slug or "generated_project").strip()
 
-    # Hard block path separators first
-    slug = slug.replace("/", "_").replace("\\", "_")
+    # Fast path: an ASCII identifier is already [A-Za-z0-9_]+ (the usual case)
+    if not (slug.isascii() and slug.isidentifier()):
+        # Hard block path separators first
+        slug = slug.replace("/", "_").replace("\\", "_")
 
-    slug = _SLUG_RE.sub("_", slug)
+        slug = _SLUG_RE.sub("_", slug)
     slug = slug.strip("_")
     return slug or "generated_project"
 
@@ -34,8 +36,12 @@ def _folders_from_paths(paths: list[str]) -> list[str]:
       myproj/
       myproj/app/
       myproj/app/api/
+
+    `paths` must be sorted: folders are emitted in first-seen order while walking a
+    trie, which for sorted input is already sorted (no set + sorted() pass).
     """
-    folders = set()
+    root: dict[str, dict] = {}
+    folders: list[str] = []
     for p in paths:
         # Normalize separators just in case
         p = p.replace("\\", "/").strip("/")
@@ -43,9 +49,16 @@ def _folders_from_paths(paths: list[str]) -> list[str]:
             continue
 
         parts = [x for x in p.split("/") if x]
-        for i in range(1, len(parts)):
-            folders.add("/".join(parts[:i]) + "/")
-    return sorted(folders)
+        node = root
+        prefix = ""
+        for part in parts[:-1]:
+            prefix = f"{prefix}{part}/"
+            child = node.get(part)
+            if child is None:
+                child = node[part] = {}
+                folders.append(prefix)
+            node = child
+    return folders
 
 
 def generate_repo_scaffold(
@@ -53,6 +66,7 @@ def generate_repo_scaffold(
     project_slug: str,
     include_docker: bool = True,
     include_github_actions: bool = False,
+    generated_at: str | None = None,
 ) -> tuple[list[str], dict[str, str]]:
     """
     Returns:
@@ -67,7 +81,11 @@ def generate_repo_scaffold(
         return f"{slug}/{rel}"
 
     # Core files
-    _add(files, p("README.md"), templates.render_readme(plan, project_slug=slug))
+    _add(
+        files,
+        p("README.md"),
+        templates.render_readme(plan, project_slug=slug, generated_at=generated_at),
+    )
     _add(files, p("requirements.txt"), templates.render_requirements_txt())
     _add(files, p(".gitignore"), templates.render_gitignore())
     _add(files, p(".env.example"), templates.render_env_example())
@@ -1,92 +1,59 @@
 from __future__ import annotations
 
 from datetime import datetime
+from string import Template
 from textwrap import dedent
 
 from app.core.schemas.agent_plan import AgentArchitecturePlan
 
+# Static files are dedented once at import; render_*() just return the constants.
+# README is a string.Template filled with the per-plan fields.
+_README_TMPL = Template(
+    dedent(
+        """
+        # ${project_slug}
 
-def _safe_title(plan: AgentArchitecturePlan) -> str:
-    comps = getattr(plan, "components", None) or []
-    first = comps[0] if comps else None
-    name = getattr(first, "name", None) if first else None
-    return f"{name} Project" if name else "Generated Project"
-
-
-def _md_bullets(items: list[str] | None, empty: str) -> str:
-    items = items or []
-    return "\n".join(f"- {x}" for x in items) if items else f"- {empty}"
-
-
-def render_readme(plan: AgentArchitecturePlan, project_slug: str) -> str:
-    title = _safe_title(plan)
-
-    components = getattr(plan, "components", None) or []
-    comp_lines: list[str] = []
-    for c in components:
-        name = getattr(c, "name", "") or "Component"
-        role = getattr(c, "role", "") or ""
-        tech_list = getattr(c, "technologies", None) or []
-        tech = f" (Tech: {', '.join(tech_list)})" if tech_list else ""
-        comp_lines.append(f"- **{name}**: {role}{tech}".rstrip())
-
-    bullets = "\n".join(comp_lines) if comp_lines else "- (No components provided)"
-
-    deployment = getattr(plan, "deployment", None) or "(not specified)"
-    scaling = getattr(plan, "scaling", None) or "(not specified)"
-    security = _md_bullets(getattr(plan, "security", None), "None provided")
-
-    # IMPORTANT: `risks` may not exist on AgentArchitecturePlan depending on your schema.
-    risks_val = getattr(plan, "risks", None)
-    risks = _md_bullets(
-        risks_val if isinstance(risks_val, list) else [], "Not provided in plan schema"
-    )
-
-    body = f"""
-    # {project_slug}
-
-    {title}
-
-    ## Overview
-    This repository was generated from an AI-produced architecture plan.
-
-    ## Architecture Components
-    {bullets}
+        ${title}
 
-    ## Deployment
-    {deployment}
+        ## Overview
+        This repository was generated from an AI-produced architecture plan.
 
-    ## Scaling
-    {scaling}
+        ## Architecture Components
+        ${bullets}
 
-    ## Security Notes
-    {security}
+        ## Deployment
+        ${deployment}
 
-    ## Risks
-    {risks}
+        ## Scaling
+        ${scaling}
 
-    ## Run Locally
-    ```bash
-    python -m venv .venv
-    # Windows PowerShell:
-    # .venv\\Scripts\\Activate.ps1
-    pip install -r requirements.txt
-    uvicorn app.main:app --reload
-    ```
+        ## Security Notes
+        ${security}
 
-    ## API Docs
-    - Swagger: http://127.0.0.1:8000/docs
+        ## Risks
+        ${risks}
 
-    Generated on {datetime.utcnow().isoformat()}Z
-    """
+        ## Run Locally
+        ```bash
+        python -m venv .venv
+        # Windows PowerShell:
+        # .venv\\Scripts\\Activate.ps1
+        pip install -r requirements.txt
+        uvicorn app.main:app --reload
+        ```
 
-    return dedent(body).strip() + "\n"
+        ## API Docs
+        - Swagger: http://127.0.0.1:8000/docs
 
+        Generated on ${generated_at}Z
+        """
+    ).strip()
+    + "\n"
+)
 
-def render_main_py() -> str:
-    return (
-        dedent(
-            """
+_MAIN_PY = (
+    dedent(
+        """
         from __future__ import annotations
 
         from fastapi import FastAPI
@@ -98,55 +65,47 @@ def render_main_py() -> str:
         def health():
             return {"status": "ok"}
         """
-        ).strip()
-        + "\n"
-    )
-
+    ).strip()
+    + "\n"
+)
 
-def render_requirements_txt() -> str:
-    return (
-        dedent(
-            """
+_REQS = (
+    dedent(
+        """
         fastapi>=0.110
         uvicorn[standard]>=0.27
         pydantic>=2.0
         """
-        ).strip()
-        + "\n"
-    )
+    ).strip()
+    + "\n"
+)
 
-
-def render_gitignore() -> str:
-    return (
-        dedent(
-            """
+_GITIGNORE = (
+    dedent(
+        """
         .venv/
         __pycache__/
         *.pyc
         .DS_Store
         .env
         """
-        ).strip()
-        + "\n"
-    )
-
+    ).strip()
+    + "\n"
+)
 
-def render_env_example() -> str:
-    return (
-        dedent(
-            """
+_ENV = (
+    dedent(
+        """
         # Example environment variables
         APP_ENV=local
         """
-        ).strip()
-        + "\n"
-    )
-
+    ).strip()
+    + "\n"
+)
 
-def render_dockerfile() -> str:
-    return (
-        dedent(
-            """
+_DOCKERFILE = (
+    dedent(
+        """
         FROM python:3.12-slim
 
         WORKDIR /app
@@ -158,21 +117,96 @@ def render_dockerfile() -> str:
         EXPOSE 8000
         CMD ["uvicorn", "app.main:app", "--host", "0.0.0.0", "--port", "8000"]
         """
-        ).strip()
-        + "\n"
-    )
+    ).strip()
+    + "\n"
+)
 
-
-def render_docker_compose() -> str:
-    return (
-        dedent(
-            """
+_COMPOSE = (
+    dedent(
+        """
         services:
           api:
             build: .
             ports:
               - "8000:8000"
         """
-        ).strip()
-        + "\n"
+    ).strip()
+    + "\n"
+)
+
+
+def _safe_title(plan: AgentArchitecturePlan) -> str:
+    comps = getattr(plan, "components", None) or []
+    first = comps[0] if comps else None
+    name = getattr(first, "name", None) if first else None
+    return f"{name} Project" if name else "Generated Project"
+
+
+def _md_bullets(items: list[str] | None, empty: str) -> str:
+    items = items or []
+    return "\n".join(f"- {x}" for x in items) if items else f"- {empty}"
+
+
+def render_readme(
+    plan: AgentArchitecturePlan, project_slug: str, generated_at: str | None = None
+) -> str:
+    """`generated_at` fills the "Generated on" line; defaults to the current UTC time."""
+    title = _safe_title(plan)
+
+    components = getattr(plan, "components", None) or []
+    comp_lines: list[str] = []
+    for c in components:
+        name = getattr(c, "name", "") or "Component"
+        role = getattr(c, "role", "") or ""
+        tech_list = getattr(c, "technologies", None) or []
+        tech = f" (Tech: {', '.join(tech_list)})" if tech_list else ""
+        comp_lines.append(f"- **{name}**: {role}{tech}".rstrip())
+
+    bullets = "\n".join(comp_lines) if comp_lines else "- (No components provided)"
+
+    deployment = getattr(plan, "deployment", None) or "(not specified)"
+    scaling = getattr(plan, "scaling", None) or "(not specified)"
+    security = _md_bullets(getattr(plan, "security", None), "None provided")
+
+    # IMPORTANT: `risks` may not exist on AgentArchitecturePlan depending on your schema.
+    risks_val = getattr(plan, "risks", None)
+    risks = _md_bullets(
+        risks_val if isinstance(risks_val, list) else [], "Not provided in plan schema"
+    )
+
+    return _README_TMPL.substitute(
+        project_slug=project_slug,
+        title=title,
+        bullets=bullets,
+        deployment=deployment,
+        scaling=scaling,
+        security=security,
+        risks=risks,
+        generated_at=(
+            generated_at if generated_at is not None else datetime.utcnow().isoformat()
+        ),
     )
+
+
+def render_main_py() -> str:
+    return _MAIN_PY
+
+
+def render_requirements_txt() -> str:
+    return _REQS
+
+
+def render_gitignore() -> str:
+    return _GITIGNORE
+
+
+def render_env_example() -> str:
+    return _ENV
+
+
+def render_dockerfile() -> str:
+    return _DOCKERFILE
+
+
+def render_docker_compose() -> str:
+    return _COMPOSE
@@ -1,24 +1,117 @@
 from __future__ import annotations
 
-import io
+import re
+import time
 import zipfile
+from collections.abc import Iterator, Mapping
 
+try:
+    # Optional: ISA-L's SIMD DEFLATE, API-compatible with zlib
+    from isal import isal_zlib
+except Exception:  # pragma: no cover
+    isal_zlib = None  # type: ignore
 
-def build_scaffold_zip_bytes(files: dict[str, str]) -> bytes:
+# Below this many content bytes, DEFLATE setup costs more than the bytes it
+# saves, so entries are STORED; above it, level 1 keeps compress time bounded.
+_STORE_THRESHOLD = 64 * 1024
+
+# stream_scaffold_zip() hands out output in chunks of at least this size
+_STREAM_CHUNK = 64 * 1024
+
+# A ".." path segment anywhere in a normalized path
+_TRAVERSAL_RE = re.compile(r"(?:^|/)\.\.(?:/|$)")
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that collects zipfile output for draining."""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return out
+
+
+def _write_entry(zf: zipfile.ZipFile, path: str, payload: bytes) -> None:
+    """zf.writestr(path, payload), with DEFLATE done by ISA-L when it is installed."""
+    if zf.compression != zipfile.ZIP_DEFLATED or isal_zlib is None:
+        zf.writestr(path, payload)
+        return
+
+    # Same entry metadata writestr() would produce. The level lives in a private
+    # ZipInfo attribute (renamed compress_level in 3.13); it only matters when the
+    # ISA-L swap below can't happen and zipfile's own zlib compressor runs.
+    zinfo = zipfile.ZipInfo(path, date_time=time.localtime(time.time())[:6])
+    zinfo.compress_type = zf.compression
+    for attr in ("compress_level", "_compresslevel"):
+        if hasattr(zinfo, attr):
+            setattr(zinfo, attr, zf.compresslevel)
+            break
+    zinfo.external_attr = 0o600 << 16
+    zinfo.file_size = len(payload)
+    with zf.open(zinfo, mode="w") as entry:
+        # zipfile has no compressor hook; swap this entry's raw-DEFLATE compressor
+        # for ISA-L's (CRC and sizes are still computed by zipfile itself). It is a
+        # CPython internal, so without it the entry just uses stdlib zlib.
+        if getattr(entry, "_compressor", None) is not None:
+            entry._compressor = isal_zlib.compressobj(
+                zf.compresslevel, isal_zlib.DEFLATED, -15
+            )
+        entry.write(payload)
+
+
+def stream_scaffold_zip(files: Mapping[str, str]) -> Iterator[bytes]:
     """
-    Build an in-memory ZIP from scaffold `files` map: path -> content.
+    Yield a ZIP of scaffold `files` (path -> content) as it is written, so the
+    archive is never held in memory as one buffer (for StreamingResponse).
     Paths should already be normalized (forward slashes, no traversal).
     """
-    buf = io.BytesIO()
+    # Encode each file once; zipfile writes bytes payloads as-is
+    encoded: dict[str, bytes] = {}
+    for path, content in files.items():
+        # Safety: block absolute paths or traversal (defense in depth)
+        safe_path = (path or "").replace("\\", "/").lstrip("/")
+        if _TRAVERSAL_RE.search(safe_path):
+            continue  # skip anything suspicious
+        encoded[safe_path] = (content or "").encode("utf-8")
+
+    total = sum(map(len, encoded.values()))
+    if total < _STORE_THRESHOLD:
+        compression, level = zipfile.ZIP_STORED, None
+    else:
+        compression, level = zipfile.ZIP_DEFLATED, 1
+
+    # Non-seekable sink: zipfile writes sizes in data descriptors after each entry
+    sink = _ChunkSink()
+    with zipfile.ZipFile(
+        sink, mode="w", compression=compression, compresslevel=level
+    ) as zf:
+        for safe_path, payload in encoded.items():
+            _write_entry(zf, safe_path, payload)
+            if sink.size >= _STREAM_CHUNK:
+                yield sink.drain()
 
-    with zipfile.ZipFile(buf, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
-        for path, content in files.items():
-            # Safety: block absolute paths or traversal (defense in depth)
-            safe_path = (path or "").replace("\\", "/").lstrip("/")
-            if ".." in safe_path.split("/"):
-                continue  # skip anything suspicious
+    # Remaining entries + central directory
+    tail = sink.drain()
+    if tail:
+        yield tail
 
-            zf.writestr(safe_path, content or "")
 
-    buf.seek(0)
-    return buf.getvalue()
+def build_scaffold_zip_bytes(files: dict[str, str]) -> bytes:
+    """
+    Build an in-memory ZIP from scaffold `files` map: path -> content.
+    Paths should already be normalized (forward slashes, no traversal).
+    """
+    return b"".join(stream_scaffold_zip(files))
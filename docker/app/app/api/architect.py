@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+import re
 from typing import Any
 
 from fastapi import APIRouter, HTTPException
@@ -29,6 +30,36 @@ planner = ArchitecturePlanner()
 # Milestone 2/3/4: LLM-based planner agent (lazy init)
 _AGENT: PlannerAgent | None = None
 
+# Error-message fragments that mean "provider unreachable / unauthorized" (one regex scan)
+_PROVIDER_DOWN_RE = re.compile(
+    "|".join(
+        map(
+            re.escape,
+            (
+                "connection",
+                "refused",
+                "timed out",
+                "timeout",
+                "failed to establish a new connection",
+                "max retries exceeded",
+                "service unavailable",
+                "502",
+                "503",
+                "504",
+                "unauthorized",
+                "forbidden",
+                "api key",
+                "invalid_api_key",
+                "authentication",
+                "permission",
+                "rate limit",
+                "quota",
+            ),
+        )
+    ),
+    re.IGNORECASE,
+)
+
 
 def _as_dict(model_obj: Any) -> dict[str, Any]:
     """Pydantic v2 (model_dump) and v1 (dict) compatibility."""
@@ -51,31 +82,31 @@ def _llm_provider() -> str:
     return (_get_env("LLM_PROVIDER", "groq") or "groq").strip().lower()
 
 
+# Resolved once at import; the environment is fixed for the container's lifetime
+_LLM_PROVIDER = _llm_provider()
+_GROQ_MODEL = _get_env("GROQ_MODEL", "llama-3.1-8b-instant")
+
+
 def _is_provider_down(msg: str) -> bool:
-    msg = (msg or "").lower()
-    return any(
-        s in msg
-        for s in [
-            "connection",
-            "refused",
-            "timed out",
-            "timeout",
-            "failed to establish a new connection",
-            "max retries exceeded",
-            "service unavailable",
-            "502",
-            "503",
-            "504",
-            "unauthorized",
-            "forbidden",
-            "api key",
-            "invalid_api_key",
-            "authentication",
-            "permission",
-            "rate limit",
-            "quota",
-        ]
-    )
+    return bool(_PROVIDER_DOWN_RE.search(msg or ""))
+
+
+def _api_error(e: Exception) -> HTTPException:
+    """
+    HTTPException to raise from an LLM-backed endpoint: HTTPExceptions pass through,
+    provider outages become a 503, anything else a 500 carrying the message.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    if _is_provider_down(str(e)):
+        return HTTPException(
+            status_code=503,
+            detail=(
+                "LLM provider is not reachable or not authorized. "
+                "Verify GROQ_API_KEY and GROQ_MODEL in Azure App Settings."
+            ),
+        )
+    return HTTPException(status_code=500, detail=str(e))
 
 
 def _get_agent() -> PlannerAgent:
@@ -89,7 +120,7 @@ def _get_agent() -> PlannerAgent:
     if _AGENT is not None:
         return _AGENT
 
-    provider = _llm_provider()
+    provider = _LLM_PROVIDER
     if provider != "groq":
         raise HTTPException(
             status_code=500,
@@ -100,7 +131,7 @@ def _get_agent() -> PlannerAgent:
         )
 
     groq_api_key = _get_env("GROQ_API_KEY")
-    groq_model = _get_env("GROQ_MODEL", "llama-3.1-8b-instant")
+    groq_model = _GROQ_MODEL
 
     if not groq_api_key:
         raise HTTPException(
@@ -138,6 +169,18 @@ def _resolve_plan_from_scaffold_payload(
     )
 
 
+def _build_scaffold(
+    plan: AgentArchitecturePlan, payload: ScaffoldRequest
+) -> tuple[list[str], dict[str, str]]:
+    """Single place that maps ScaffoldRequest flags onto generate_repo_scaffold()."""
+    return generate_repo_scaffold(
+        plan=plan,
+        project_slug=payload.project_slug,
+        include_docker=payload.include_docker,
+        include_github_actions=payload.include_github_actions,
+    )
+
+
 @router.post("/preview", response_model=ArchitecturePlan)
 def preview_architecture(idea: ProjectIdeaInput) -> ArchitecturePlan:
     """Milestone 1: ML model + encoder -> ArchitecturePlan."""
@@ -155,18 +198,8 @@ def agent_plan(idea: ProjectIdeaInput) -> AgentArchitecturePlan:
     try:
         agent = _get_agent()
         return agent.plan(_as_dict(idea))
-    except HTTPException:
-        raise
     except Exception as e:
-        if _is_provider_down(str(e)):
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    "LLM provider is not reachable or not authorized. "
-                    "Verify GROQ_API_KEY and GROQ_MODEL in Azure App Settings."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
 
 
 @router.post("/diagram-from-idea", response_model=DiagramPipelineResponse)
@@ -190,18 +223,8 @@ def diagram_from_idea(payload: DiagramPipelineRequest) -> DiagramPipelineRespons
             render_url=None,
         )
 
-    except HTTPException:
-        raise
     except Exception as e:
-        if _is_provider_down(str(e)):
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    "LLM provider is not reachable or not authorized. "
-                    "Verify GROQ_API_KEY and GROQ_MODEL in Azure App Settings."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
 
 
 @router.post("/scaffold", response_model=ScaffoldResponse)
@@ -210,12 +233,7 @@ def scaffold_repo(payload: ScaffoldRequest) -> ScaffoldResponse:
     try:
         plan = _resolve_plan_from_scaffold_payload(payload)
 
-        tree, files = generate_repo_scaffold(
-            plan=plan,
-            project_slug=payload.project_slug,
-            include_docker=payload.include_docker,
-            include_github_actions=payload.include_github_actions,
-        )
+        tree, files = _build_scaffold(plan, payload)
 
         return ScaffoldResponse(
             project_slug=payload.project_slug,
@@ -224,18 +242,8 @@ def scaffold_repo(payload: ScaffoldRequest) -> ScaffoldResponse:
             plan=plan,
         )
 
-    except HTTPException:
-        raise
     except Exception as e:
-        if _is_provider_down(str(e)):
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    "LLM provider is not reachable or not authorized. "
-                    "Verify GROQ_API_KEY and GROQ_MODEL in Azure App Settings."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
 
 
 @router.post("/scaffold/zip", response_class=Response)
@@ -244,12 +252,7 @@ def scaffold_repo_zip(payload: ScaffoldRequest) -> Response:
     try:
         plan = _resolve_plan_from_scaffold_payload(payload)
 
-        _tree, files = generate_repo_scaffold(
-            plan=plan,
-            project_slug=payload.project_slug,
-            include_docker=payload.include_docker,
-            include_github_actions=payload.include_docker,
-        )
+        _tree, files = _build_scaffold(plan, payload)
 
         zip_bytes = build_scaffold_zip_bytes(files)
         filename = f"{payload.project_slug or 'generated_project'}.zip"
@@ -260,15 +263,5 @@ def scaffold_repo_zip(payload: ScaffoldRequest) -> Response:
             headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
-    except HTTPException:
-        raise
     except Exception as e:
-        if _is_provider_down(str(e)):
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    "LLM provider is not reachable or not authorized. "
-                    "Verify GROQ_API_KEY and GROQ_MODEL in Azure App Settings."
-                ),
-            )
-        raise HTTPException(status_code=500, detail=str(e))
+        raise _api_error(e)
@@ -1,24 +1,26 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from app.api.architect import router as architect_router
 
 app = FastAPI(
     title="AI Architecture Designer ML",
+    default_response_class=ORJSONResponse,
 )
 
 app.include_router(architect_router)
 
 
 @app.get("/")
-def root():
+async def root():
     return {"service": "ai-arch-designer-ml", "status": "ok"}
 
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "healthy"}
 
 
 @app.get("/version")
-def version():
+async def version():
     return {"version": "0.1.0"}
@@ -4,37 +4,61 @@ from pathlib import Path
 from typing import Any, Dict
 
 import joblib
-import pandas as pd
 
 
 MODEL_PATH = Path("artifacts/models/pattern_model.joblib")
 ENCODER_PATH = Path("artifacts/models/pattern_encoder.joblib")
 
+# Loaded once per process at import. mmap_mode="r" keeps the numpy arrays inside the
+# forest as read-only file views, so uvicorn workers share them via the page cache.
+_MODEL = joblib.load(MODEL_PATH, mmap_mode="r") if MODEL_PATH.exists() else None
+_ENCODER = joblib.load(ENCODER_PATH, mmap_mode="r") if ENCODER_PATH.exists() else None
+
+# Training columns (app/ml/training/train_pattern.py); every one is part of the encoding
+_FEATURE_COLUMNS = ("domain", "scale", "budget", "users", "compliance_count")
+
+# Feature row (in _FEATURE_COLUMNS order) -> label. Inputs are drawn from a small
+# categorical grid and the prediction is deterministic, so a dict hit replaces
+# encode + forest traversal.
+_PREDICTIONS: dict[tuple[Any, ...], str] = {}
+_MAX_PREDICTIONS = 4096
+
 
 class PatternPredictor:
     def __init__(self) -> None:
-        if not MODEL_PATH.exists():
+        if _MODEL is None:
             raise FileNotFoundError(
                 f"Missing model at {MODEL_PATH}. Train it with: python -m app.ml.training.train_pattern"
             )
-        if not ENCODER_PATH.exists():
+        if _ENCODER is None:
             raise FileNotFoundError(
                 f"Missing encoder at {ENCODER_PATH}. Train it with: python -m app.ml.training.train_pattern"
             )
 
-        self.model = joblib.load(MODEL_PATH)
-        self.encoder = joblib.load(ENCODER_PATH)
+        self.model = _MODEL
+        self.encoder = _ENCODER
 
     def predict(self, features: Dict[str, Any]) -> str:
-        # Keep exactly the same feature columns used in training
-        X = pd.DataFrame(
-            [{
-                "domain": features.get("domain", "unknown"),
-                "scale": features.get("scale", "prototype"),
-                "budget": features.get("budget", "low"),
-            }]
-        )
-
-        X_enc = self.encoder.transform(X)
-        pred = self.model.predict(X_enc)[0]
-        return str(pred)
+        # Keep exactly the same feature columns used in training. The encoder maps
+        # a missing column to all zeros, which still yields a (wrong) label, so the
+        # numeric columns are required rather than defaulted.
+        missing = [c for c in ("users", "compliance_count") if c not in features]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        row = {
+            "domain": features.get("domain", "unknown"),
+            "scale": features.get("scale", "prototype"),
+            "budget": features.get("budget", "low"),
+            "users": features["users"],
+            "compliance_count": features["compliance_count"],
+        }
+        key = tuple(row[c] for c in _FEATURE_COLUMNS)
+        label = _PREDICTIONS.get(key)
+        if label is not None:
+            return label
+
+        X_enc = self.encoder.transform_record(row)
+        label = str(self.model.predict(X_enc)[0])
+        if len(_PREDICTIONS) < _MAX_PREDICTIONS:
+            _PREDICTIONS[key] = label
+        return label
@@ -1,68 +1,112 @@
 from __future__ import annotations
 
-from typing import Literal
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Literal, NamedTuple
 
 from app.core.schemas.agent_plan import AgentArchitecturePlan
 
+# Byte table for _sanitize_id(): ASCII alphanumerics kept, every other byte -> "_".
+# bytes.translate is a flat 256-entry lookup in C (str.translate goes through a dict).
+_ID_TABLE = bytes(c if chr(c).isascii() and chr(c).isalnum() else 0x5F for c in range(256))
+
+# _flow_diagram() entry score of a "gateway"/"api" name that is also "ui"/"client"
+_MAX_ENTRY_SCORE = 5
+
+
+class _Component(NamedTuple):
+    # The ComponentSpec fields the diagrams read, as a hashable cache-key entry
+    name: str
+    role: str | None
+    technologies: tuple[str, ...]
+
 
 def build_mermaid(
     plan: AgentArchitecturePlan,
     diagram_type: Literal["flow", "component"] = "flow",
     title: str | None = None,
 ) -> str:
+    comps = tuple(
+        _Component(c.name, getattr(c, "role", None), tuple(c.technologies or ()))
+        for c in (plan.components or [])
+    )
+    return _build_mermaid_cached(comps, diagram_type, title)
+
+
+@lru_cache(maxsize=256)
+def _build_mermaid_cached(
+    comps: tuple[_Component, ...], diagram_type: str, title: str | None
+) -> str:
+    # Cached plans come back equal for the same idea, so the same diagram is
+    # rebuilt on every request for it; the key is hashed once per lookup
     if diagram_type == "component":
-        return _component_diagram(plan, title=title)
-    return _flow_diagram(plan, title=title)
+        return _component_diagram(comps, title=title)
+    return _flow_diagram(comps, title=title)
 
 
 def _sanitize_id(s: str) -> str:
     # Mermaid node IDs: safest is letters/numbers/underscore only
-    out = []
-    for ch in s or "":
-        out.append(ch if ch.isalnum() else "_")
-    cleaned = "".join(out).strip("_")
-    return cleaned or "node"
+    s = s or ""
+    if s.isascii():
+        cleaned = s.encode("ascii").translate(_ID_TABLE).decode("ascii")
+    else:
+        # str.isalnum() is Unicode-aware (keeps e.g. "é"); per-character path
+        cleaned = "".join(ch if ch.isalnum() else "_" for ch in s)
+    return cleaned.strip("_") or "node"
+
+
+def _sanitize_ids_many(names: list[str]) -> list[str]:
+    """_sanitize_id() for many names: ASCII batches go through one translate() call."""
+    names = [n or "" for n in names]
+    joined = "\n".join(names)
+    if not joined.isascii():
+        return [_sanitize_id(n) for n in names]
+
+    cleaned = joined.encode("ascii").translate(_ID_TABLE).decode("ascii")
+    ids: list[str] = []
+    pos = 0
+    for n in names:
+        end = pos + len(n)
+        ids.append(cleaned[pos:end].strip("_") or "node")
+        pos = end + 1  # skip the separator
+    return ids
 
 
 def _escape_label(s: str) -> str:
-    # Mermaid labels are quoted. Escape quotes.
-    return (s or "").replace('"', '\\"')
+    # Mermaid labels are quoted. Escape quotes (most labels have none: skip replace()).
+    s = s or ""
+    return s if '"' not in s else s.replace('"', '\\"')
 
 
 def _make_unique_ids(names: list[str]) -> list[str]:
+    bases = _sanitize_ids_many(names)
+    if len(set(bases)) == len(bases):
+        return bases  # the usual case: no collisions, nothing to suffix
+
     seen: dict[str, int] = {}
     ids: list[str] = []
-    for n in names:
-        base = _sanitize_id(n)
+    for base in bases:
         count = seen.get(base, 0) + 1
         seen[base] = count
         ids.append(base if count == 1 else f"{base}_{count}")
     return ids
 
 
-def _component_diagram(plan: AgentArchitecturePlan, title: str | None = None) -> str:
+def _component_diagram(comps: Sequence[_Component], title: str | None = None) -> str:
     lines: list[str] = ["flowchart TB"]
     if title:
         lines.append(f"%% {_escape_label(title)}")
 
-    comps = list(plan.components or [])
     if not comps:
         return "flowchart TB\nA[No components]\n"
 
-    names = [c.name for c in comps]
-    node_ids = _make_unique_ids(names)
-
-    # Build name->id mapping in order
-    name_to_id: dict[str, str] = {}
-    for idx, c in enumerate(comps):
-        name_to_id[c.name] = node_ids[idx]
+    node_ids = _make_unique_ids([c.name for c in comps])
 
     # Nodes
-    for idx, c in enumerate(comps):
-        nid = node_ids[idx]
-        tech = ", ".join(c.technologies or [])
+    for nid, c in zip(node_ids, comps):
+        tech = ", ".join(c.technologies)
         label_parts = [c.name]
-        if getattr(c, "role", None):
+        if c.role:
             label_parts.append(c.role)
         if tech:
             label_parts.append(f"[{tech}]")
@@ -76,7 +120,7 @@ def _component_diagram(plan: AgentArchitecturePlan, title: str | None = None) ->
     return "\n".join(lines) + "\n"
 
 
-def _flow_diagram(plan: AgentArchitecturePlan, title: str | None = None) -> str:
+def _flow_diagram(comps: Sequence[_Component], title: str | None = None) -> str:
     """
     Heuristic flow:
     - Pick an entry node (gateway/api/ui)
@@ -86,39 +130,34 @@ def _flow_diagram(plan: AgentArchitecturePlan, title: str | None = None) -> str:
     if title:
         lines.append(f"%% {_escape_label(title)}")
 
-    comps = list(plan.components or [])
     if not comps:
         return "flowchart LR\nA[No components]\n"
 
-    def score_entry(name: str) -> int:
-        n = (name or "").lower()
-        score = 0
-        if "gateway" in n or "api" in n:
-            score += 3
-        if "ui" in n or "frontend" in n or "client" in n:
-            score += 2
-        return score
-
-    entry = max(comps, key=lambda c: score_entry(c.name))
-
-    names = [c.name for c in comps]
-    node_ids = _make_unique_ids(names)
-
-    name_to_id: dict[str, str] = {}
-    for i, name in enumerate(names):
-        name_to_id[name] = node_ids[i]
-
-    entry_id = name_to_id.get(entry.name, _sanitize_id(entry.name))
-
-    # Nodes
-    for c in comps:
-        nid = name_to_id.get(c.name, _sanitize_id(c.name))
-        lines.append(f'{nid}["{_escape_label(c.name)}"]')
+    node_ids = _make_unique_ids([c.name for c in comps])
+
+    # One pass: emit nodes and pick the entry node (gateway/api, then ui/client;
+    # first best wins) as we go. Once a node scores _MAX_ENTRY_SCORE nothing can
+    # beat it, so the remaining names are only emitted, not scored.
+    entry_idx, best = 0, -1
+    for i, c in enumerate(comps):
+        name = c.name or ""
+        if best < _MAX_ENTRY_SCORE and name:
+            n = name.lower()
+            score = 0
+            if "gateway" in n or "api" in n:
+                score += 3
+            if "ui" in n or "frontend" in n or "client" in n:
+                score += 2
+            if score > best:
+                entry_idx, best = i, score
+        elif best < 0:
+            entry_idx, best = i, 0
+        lines.append(f'{node_ids[i]}["{_escape_label(name)}"]')
 
     # Edges: entry -> others
-    for c in comps:
-        if c.name == entry.name:
-            continue
-        lines.append(f"{entry_id} --> {name_to_id.get(c.name, _sanitize_id(c.name))}")
+    entry_id = node_ids[entry_idx]
+    for i, nid in enumerate(node_ids):
+        if i != entry_idx:
+            lines.append(f"{entry_id} --> {nid}")
 
     return "\n".join(lines) + "\n"
@@ -1,9 +1,20 @@
 from __future__ import annotations
 
+import json
+from collections.abc import Iterator
 from typing import Any
 
 import requests
 
+try:
+    # Optional: faster NDJSON line parsing; stdlib json reads the same bytes lines
+    from orjson import loads as _json_loads
+except ImportError:  # pragma: no cover
+    _json_loads = json.loads
+
+# One keep-alive connection pool per process, shared by every OllamaClient
+_SESSION = requests.Session()
+
 
 class OllamaClient:
     def __init__(
@@ -16,6 +27,16 @@ class OllamaClient:
         """
         Uses Ollama /api/chat and returns the assistant message content as a string.
         """
+        content = "".join(self.stream_chat(system, user, timeout=timeout))
+        if not content:
+            raise RuntimeError("Ollama returned empty content.")
+        return content
+
+    def stream_chat(self, system: str, user: str, timeout: int = 60) -> Iterator[str]:
+        """
+        Yield content deltas as Ollama generates them (/api/chat with stream=True).
+        `timeout` bounds each read, so a long generation is fine while tokens flow.
+        """
         url = f"{self.base_url}/api/chat"
         payload: dict[str, Any] = {
             "model": self.model,
@@ -23,16 +44,20 @@ class OllamaClient:
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
-            "stream": False,
+            "stream": True,
         }
 
-        r = requests.post(url, json=payload, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
-
-        # Ollama returns: {"message": {"role": "...", "content": "..."} , ...}
-        msg = data.get("message") or {}
-        content: str | None = msg.get("content")
-        if not content:
-            raise RuntimeError(f"Ollama returned empty content: {data}")
-        return content
+        with _SESSION.post(url, json=payload, timeout=timeout, stream=True) as r:
+            r.raise_for_status()
+            # NDJSON: {"message": {"role": "...", "content": "..."}, "done": false} per line
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = _json_loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama error: {data['error']}")
+                piece = (data.get("message") or {}).get("content")
+                if piece:
+                    yield piece
+                if data.get("done"):
+                    break
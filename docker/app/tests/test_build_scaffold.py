@@ -0,0 +1,65 @@
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+# docker/app: its `app` package is what the container imports as `app`
+DOCKER_APP = Path(__file__).resolve().parents[1]
+
+PLAN = {
+    "components": [
+        {"name": "API", "role": "routing", "technologies": ["FastAPI"]},
+    ],
+    "deployment": "Azure",
+    "scaling": "horizontal",
+    "security": ["TLS"],
+}
+
+
+def _drop_app_modules() -> None:
+    for name in [n for n in sys.modules if n == "app" or n.startswith("app.")]:
+        del sys.modules[name]
+
+
+@pytest.fixture
+def docker_architect(monkeypatch):
+    """
+    docker/app/app/api/architect.py, loaded from its file with `app` resolving to
+    docker/app/app (not the root package) and GroqClient stubbed: that tree ships
+    no app/services/llm/groq_client.py, and the scaffold path never calls the LLM.
+    """
+    saved = {n: m for n, m in sys.modules.items() if n == "app" or n.startswith("app.")}
+    _drop_app_modules()
+    monkeypatch.syspath_prepend(str(DOCKER_APP))
+    groq_stub = types.ModuleType("app.services.llm.groq_client")
+    groq_stub.GroqClient = object
+    sys.modules[groq_stub.__name__] = groq_stub
+
+    spec = importlib.util.spec_from_file_location(
+        "docker_app_architect", DOCKER_APP / "app" / "api" / "architect.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    try:
+        yield module
+    finally:
+        _drop_app_modules()
+        sys.modules.update(saved)
+
+
+def test_build_scaffold_honours_include_github_actions(docker_architect):
+    arch = docker_architect
+    assert Path(arch.__file__).is_relative_to(DOCKER_APP)
+
+    payload = arch.ScaffoldRequest(
+        plan=PLAN,
+        project_slug="demo",
+        include_docker=False,
+        include_github_actions=True,
+    )
+    _tree, files = arch._build_scaffold(payload.plan, payload)
+
+    assert any(p.startswith("demo/.github/workflows/") for p in files)
+    assert "demo/Dockerfile" not in files
@@ -1,11 +1,26 @@
-import base64
+import atexit
+import hashlib
 import json
 import os
 import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any
 
+import orjson
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Optional: SIMD base64 (same API as the stdlib function)
+    from pybase64 import urlsafe_b64encode
+except Exception:  # pragma: no cover
+    from base64 import urlsafe_b64encode
 
 
 # -----------------------------
@@ -39,21 +54,97 @@ ZIP_ENDPOINT = f"{API_BASE_URL}/architect/scaffold/zip"
 
 DEFAULT_TIMEOUT = 60  # seconds
 
+# Content-Disposition filename of the scaffold ZIP (compiled once, not per download)
+_CD_FILENAME_RE = re.compile(r'filename="?([^"]+)"?', re.IGNORECASE)
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """
+    One pooled Session per UI process (st.cache_resource survives reruns), so the
+    preview -> plan -> diagram -> scaffold -> zip calls reuse keep-alive connections
+    instead of opening a fresh TCP/TLS connection each.
+    """
+    s = requests.Session()
+    # Retry only covers connect errors / idempotent methods; POSTs are never resent
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.2),
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
 
 # -----------------------------
 # Helpers
 # -----------------------------
 def safe_json(obj: Any) -> str:
-    return json.dumps(obj, indent=2, ensure_ascii=False)
+    # orjson (C) is ~50x faster than json.dumps(indent=...) on plan-sized blobs,
+    # which are re-rendered on every rerun; stdlib covers what orjson rejects
+    # (e.g. ints beyond 64 bits)
+    try:
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    except TypeError:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
 def mermaid_ink_url(mermaid_code: str) -> str:
     """
-    Render Mermaid via mermaid.ink as SVG using base64.
+    Render Mermaid via mermaid.ink as SVG using (URL-safe) base64.
     """
-    raw = mermaid_code.encode("utf-8")
-    b64 = base64.b64encode(raw).decode("ascii")
-    return f"https://mermaid.ink/svg/{b64}"
+    # URL-safe alphabet: standard base64 can emit "/", which splits the URL path
+    return "https://mermaid.ink/svg/" + urlsafe_b64encode(
+        mermaid_code.encode("utf-8")
+    ).decode("ascii")
+
+
+# Rendered diagrams, one <sha1 of mermaid source>.svg per distinct diagram
+MERMAID_CACHE_DIR = Path(
+    os.getenv("MERMAID_CACHE_DIR", Path(tempfile.gettempdir()) / "mermaid_cache")
+)
+
+# Keep at most this many SVGs on disk (and in st.cache_data); oldest go first
+MERMAID_CACHE_MAX = int(os.getenv("MERMAID_CACHE_MAX", "256"))
+
+
+def prune_mermaid_cache(max_files: int = MERMAID_CACHE_MAX) -> None:
+    """Trim MERMAID_CACHE_DIR to the max_files most recently written SVGs."""
+    try:
+        svgs = sorted(
+            MERMAID_CACHE_DIR.glob("*.svg"), key=lambda p: p.stat().st_mtime
+        )
+        for p in svgs[: max(len(svgs) - max_files, 0)]:
+            p.unlink()
+    except OSError:
+        pass  # raced with another process's prune
+
+
+@st.cache_data(show_spinner=False, max_entries=MERMAID_CACHE_MAX)
+def render_mermaid_svg(mermaid_code: str) -> str:
+    """
+    SVG markup for a diagram, fetched from mermaid.ink once per distinct source:
+    memoized across reruns (st.cache_data) and on disk across restarts.
+    Raises requests.RequestException if it can't be fetched (errors aren't cached).
+    """
+    digest = hashlib.sha1(mermaid_code.encode("utf-8")).hexdigest()
+    path = MERMAID_CACHE_DIR / f"{digest}.svg"
+    if path.is_file():
+        return path.read_text(encoding="utf-8")
+
+    r = http_session().get(mermaid_ink_url(mermaid_code), timeout=10)
+    r.raise_for_status()
+    svg = r.text
+    try:
+        MERMAID_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(svg, encoding="utf-8")
+        prune_mermaid_cache()
+    except OSError:
+        pass  # read-only FS: the in-process cache still applies
+    return svg
 
 
 def api_post_json_simple(
@@ -62,30 +153,106 @@ def api_post_json_simple(
     """
     Returns (status_code, json_data_or_empty, raw_text)
     """
-    r = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
+    r = http_session().post(url, json=payload, timeout=DEFAULT_TIMEOUT)
     try:
-        return r.status_code, r.json(), r.text
+        return r.status_code, orjson.loads(r.content), r.text
     except Exception:
         return r.status_code, {}, r.text
 
 
+def store_preview_result(result: tuple[int, dict[str, Any], str]) -> None:
+    """Render a failed /preview call (main thread only); keep its data in session_state."""
+    pv_status, pv_data, pv_raw = result
+    if pv_status != 200:
+        st.warning(f"Preview failed ({pv_status}).")
+        st.error("Preview error response:")
+        st.code(pv_raw, language="text")
+        st.session_state.latest_preview = None
+    else:
+        st.session_state.latest_preview = pv_data
+
+
 def api_post_zip(
     url: str, payload: dict[str, Any]
-) -> tuple[int, bytes, dict[str, str], str]:
+) -> tuple[int, str | None, dict[str, str], str]:
+    """
+    Returns (status_code, zip_path_or_none, headers, error_text_if_any)
+    The body is streamed to a temp file instead of being held in memory.
+    """
+    with http_session().post(
+        url, json=payload, timeout=DEFAULT_TIMEOUT, stream=True
+    ) as r:
+        if r.status_code != 200:
+            return r.status_code, None, dict(r.headers), r.text
+        return r.status_code, save_zip_response(r), dict(r.headers), ""
+
+
+# Scaffold ZIPs are streamed to a temp file this many bytes at a time
+ZIP_CHUNK = 64 * 1024
+
+# Scaffold ZIPs older than this many seconds belong to abandoned sessions
+ZIP_MAX_AGE = int(os.getenv("SCAFFOLD_ZIP_MAX_AGE", "3600"))
+
+
+@st.cache_resource
+def zip_dir() -> Path:
+    """One private temp dir for this UI process's scaffold ZIPs, removed on exit."""
+    d = Path(tempfile.mkdtemp(prefix="scaffold_zips_"))
+    atexit.register(shutil.rmtree, d, ignore_errors=True)
+    return d
+
+
+def prune_zips(max_age: int = ZIP_MAX_AGE) -> None:
+    """Delete ZIPs that no session has replaced or cleaned up within max_age seconds."""
+    cutoff = time.time() - max_age
+    for p in zip_dir().glob("scaffold_*.zip"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+        except OSError:
+            pass  # already gone (its session replaced it meanwhile)
+
+
+def save_zip_response(r: requests.Response) -> str:
+    """Stream a ZIP response body to a temp file (ZIP_CHUNK at a time); returns its path."""
+    prune_zips()
+    f = tempfile.NamedTemporaryFile(
+        prefix="scaffold_", suffix=".zip", dir=zip_dir(), delete=False
+    )
+    try:
+        with f:
+            for chunk in r.iter_content(chunk_size=ZIP_CHUNK):
+                f.write(chunk)
+    except Exception:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+    return f.name
+
+
+def set_latest_zip(path: str | None, name: str | None) -> None:
+    # Only the path lives in session_state; the previous ZIP is unreachable now, drop it
+    old = st.session_state.get("latest_zip_path")
+    if old and old != path:
+        Path(old).unlink(missing_ok=True)
+    st.session_state.latest_zip_path = path
+    st.session_state.latest_zip_name = name
+
+
+def scaffold_for_display(scaffold: dict[str, Any] | None) -> dict[str, Any] | None:
     """
-    Returns (status_code, zip_bytes, headers, error_text_if_any)
+    Keep only the scaffold tree for session_state: the page renders just the tree,
+    and the file contents (the bulk of the response) already ship in the ZIP.
     """
-    r = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
-    if r.status_code != 200:
-        return r.status_code, b"", dict(r.headers), r.text
-    return r.status_code, r.content, dict(r.headers), ""
+    if not scaffold or "tree" not in scaffold:
+        return scaffold
+    return {"tree": scaffold["tree"]}
 
 
 def guess_zip_filename(headers: dict[str, str]) -> str:
     cd = headers.get("content-disposition", "") or headers.get(
         "Content-Disposition", ""
     )
-    m = re.search(r'filename="?([^"]+)"?', cd, flags=re.IGNORECASE)
+    m = _CD_FILENAME_RE.search(cd)
     if m:
         return m.group(1)
     return "generated_project.zip"
@@ -189,18 +356,19 @@ with col2:
 # -----------------------------
 # Session state
 # -----------------------------
-if "latest_preview" not in st.session_state:
-    st.session_state.latest_preview = None  # /preview output
-if "latest_plan" not in st.session_state:
-    st.session_state.latest_plan = None  # /agent-plan output
-if "latest_mermaid" not in st.session_state:
-    st.session_state.latest_mermaid = None  # /diagram-from-idea mermaid string
-if "latest_scaffold" not in st.session_state:
-    st.session_state.latest_scaffold = None
-if "latest_zip_bytes" not in st.session_state:
-    st.session_state.latest_zip_bytes = None
-if "latest_zip_name" not in st.session_state:
-    st.session_state.latest_zip_name = None
+# Seeded once per browser session; later reruns pay a single flag lookup
+if "_initialized" not in st.session_state:
+    st.session_state.update(
+        {
+            "latest_preview": None,  # /preview output
+            "latest_plan": None,  # /agent-plan output
+            "latest_mermaid": None,  # /diagram-from-idea mermaid string
+            "latest_scaffold": None,
+            "latest_zip_path": None,
+            "latest_zip_name": None,
+        }
+    )
+    st.session_state["_initialized"] = True
 
 
 # -----------------------------
@@ -249,34 +417,6 @@ if generate_btn:
         st.stop()
 
     idea_payload = build_idea_payload()
-
-    # 0) Preview (ML)
-    status_box.info("Calling /architect/preview (ML) ...")
-    pv_status, pv_data, pv_raw = api_post_json_simple(PREVIEW_ENDPOINT, idea_payload)
-    if pv_status != 200:
-        status_box.warning(f"Preview failed ({pv_status}). Continuing to LLM plan...")
-        st.error("Preview error response:")
-        st.code(pv_raw, language="text")
-        st.session_state.latest_preview = None
-    else:
-        st.session_state.latest_preview = pv_data
-
-    # 1) Agent Plan (LLM)
-    status_box.info("Calling /architect/agent-plan ...")
-    plan_status, plan_data, plan_raw = api_post_json_simple(
-        AGENT_PLAN_ENDPOINT, idea_payload
-    )
-    if plan_status != 200:
-        status_box.error(f"Agent plan failed ({plan_status}).")
-        st.error("Agent plan error response:")
-        st.code(plan_raw, language="text")
-        st.stop()
-
-    st.session_state.latest_plan = plan_data
-    status_box.success("Agent plan generated ✅")
-
-    # 2) Diagram (✅ diagram_type is now wired to dropdown)
-    status_box.info("Calling /architect/diagram-from-idea ...")
     diagram_req = {
         "idea": idea_payload,
         "diagram_type": diagram_type,  # ✅ FIX: no longer hardcoded
@@ -287,49 +427,74 @@ if generate_btn:
     with st.expander("Debug: diagram request payload"):
         st.json(diagram_req)
 
-    d_status, d_data, d_raw = api_post_json_simple(DIAGRAM_ENDPOINT, diagram_req)
-    if d_status == 200:
-        st.session_state.latest_mermaid = extract_mermaid(d_data)
-    else:
-        st.session_state.latest_mermaid = None
-        with st.expander("Diagram endpoint error response"):
-            st.code(d_raw, language="text")
-
-    # 3) Scaffold
-    status_box.info("Calling /architect/scaffold ...")
-    scaffold_req = {
-        "idea": idea_payload,
-        "plan": plan_data,
-        "project_slug": "generated_project",
-        "include_docker": include_docker,
-        "include_github_actions": include_github_actions,
-    }
-    sc_status, sc_data, sc_raw = api_post_json_simple(SCAFFOLD_ENDPOINT, scaffold_req)
-
-    if sc_status != 200:
-        status_box.warning(f"Scaffold failed ({sc_status}), but plan succeeded.")
-        st.error("Scaffold error response:")
-        st.code(sc_raw, language="text")
-        st.session_state.latest_scaffold = None
-    else:
-        st.session_state.latest_scaffold = sc_data
-
-    # 4) ZIP
-    status_box.info("Calling /architect/scaffold/zip ...")
-    zip_status, zip_bytes, zip_headers, zip_err = api_post_zip(
-        ZIP_ENDPOINT, scaffold_req
-    )
+    # Only scaffold/zip depend on the plan, so preview, plan and diagram are sent
+    # together and scaffold + zip follow as soon as the plan is back.
+    # Workers only do HTTP; all st.* rendering stays on this (script) thread.
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        status_box.info(
+            "Calling /architect/preview, /architect/agent-plan and "
+            "/architect/diagram-from-idea ..."
+        )
+        preview_f = pool.submit(api_post_json_simple, PREVIEW_ENDPOINT, idea_payload)
+        plan_f = pool.submit(api_post_json_simple, AGENT_PLAN_ENDPOINT, idea_payload)
+        diagram_f = pool.submit(api_post_json_simple, DIAGRAM_ENDPOINT, diagram_req)
+
+        # 1) Agent Plan (LLM)
+        plan_status, plan_data, plan_raw = plan_f.result()
+        if plan_status != 200:
+            status_box.error(f"Agent plan failed ({plan_status}).")
+            st.error("Agent plan error response:")
+            st.code(plan_raw, language="text")
+            # The preview call doesn't need the plan; keep its result regardless
+            store_preview_result(preview_f.result())
+            st.stop()
+
+        st.session_state.latest_plan = plan_data
+        status_box.success("Agent plan generated ✅")
+
+        # 3) Scaffold + 4) ZIP, in flight while preview/diagram results are handled
+        status_box.info("Calling /architect/scaffold and /architect/scaffold/zip ...")
+        scaffold_req = {
+            "idea": idea_payload,
+            "plan": plan_data,
+            "project_slug": "generated_project",
+            "include_docker": include_docker,
+            "include_github_actions": include_github_actions,
+        }
+        scaffold_f = pool.submit(api_post_json_simple, SCAFFOLD_ENDPOINT, scaffold_req)
+        zip_f = pool.submit(api_post_zip, ZIP_ENDPOINT, scaffold_req)
+
+        # 0) Preview (ML)
+        store_preview_result(preview_f.result())
+
+        # 2) Diagram (✅ diagram_type is now wired to dropdown)
+        d_status, d_data, d_raw = diagram_f.result()
+        if d_status == 200:
+            st.session_state.latest_mermaid = extract_mermaid(d_data)
+        else:
+            st.session_state.latest_mermaid = None
+            with st.expander("Diagram endpoint error response"):
+                st.code(d_raw, language="text")
+
+        sc_status, sc_data, sc_raw = scaffold_f.result()
+        if sc_status != 200:
+            status_box.warning(f"Scaffold failed ({sc_status}), but plan succeeded.")
+            st.error("Scaffold error response:")
+            st.code(sc_raw, language="text")
+            st.session_state.latest_scaffold = None
+        else:
+            st.session_state.latest_scaffold = scaffold_for_display(sc_data)
+
+        zip_status, zip_path, zip_headers, zip_err = zip_f.result()
 
     if zip_status != 200:
         status_box.warning(f"ZIP failed ({zip_status}).")
         st.error("ZIP error response:")
         st.code(zip_err, language="text")
-        st.session_state.latest_zip_bytes = None
-        st.session_state.latest_zip_name = None
+        set_latest_zip(None, None)
     else:
         zip_name = guess_zip_filename(zip_headers)
-        st.session_state.latest_zip_bytes = zip_bytes
-        st.session_state.latest_zip_name = zip_name
+        set_latest_zip(zip_path, zip_name)
         status_box.success("✅ Done — ZIP ready for download")
 
 
@@ -368,8 +533,12 @@ st.divider()
 st.subheader("🗺️ Diagram Preview (Mermaid)")
 if st.session_state.latest_mermaid:
     st.caption("Rendered via mermaid.ink (SVG).")
-    svg_url = mermaid_ink_url(st.session_state.latest_mermaid)
-    st.components.v1.iframe(svg_url, height=520, scrolling=True)
+    try:
+        st.image(render_mermaid_svg(st.session_state.latest_mermaid))
+    except requests.RequestException:
+        # mermaid.ink unreachable from the server: let the browser try directly
+        svg_url = mermaid_ink_url(st.session_state.latest_mermaid)
+        st.components.v1.iframe(svg_url, height=520, scrolling=True)
 
     with st.expander("Show Mermaid code"):
         st.code(st.session_state.latest_mermaid, language="text")
@@ -391,10 +560,12 @@ with c1:
 
 with c2:
     st.subheader("⬇️ Download ZIP")
-    if st.session_state.latest_zip_bytes and st.session_state.latest_zip_name:
+    zip_path = st.session_state.latest_zip_path
+    if zip_path and Path(zip_path).is_file() and st.session_state.latest_zip_name:
         st.download_button(
             label=f"Download {st.session_state.latest_zip_name}",
-            data=st.session_state.latest_zip_bytes,
+            # Deferred: the file is read only when the button is clicked
+            data=Path(zip_path).read_bytes,
             file_name=st.session_state.latest_zip_name,
             mime="application/zip",
             use_container_width=True,
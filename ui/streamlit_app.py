@@ -1,11 +1,26 @@
-import base64
+import atexit
+import hashlib
 import json
 import os
 import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from typing import Any
 
+import orjson
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    # Optional: SIMD base64 (same API as the stdlib function)
+    from pybase64 import urlsafe_b64encode
+except Exception:  # pragma: no cover
+    from base64 import urlsafe_b64encode
 
 # =========================================================
 # Page Config (MUST be first Streamlit call)
@@ -98,68 +113,221 @@ ZIP_ENDPOINT = f"{API_INTERNAL_URL}/architect/scaffold/zip"
 
 DEFAULT_TIMEOUT = 90  # Groq calls can take longer than local Ollama sometimes
 
+# Content-Disposition filename of the scaffold ZIP (compiled once, not per download)
+_CD_FILENAME_RE = re.compile(r'filename="?([^"]+)"?', re.IGNORECASE)
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """
+    One pooled Session per UI process (st.cache_resource survives reruns), so the
+    preview -> plan -> diagram -> scaffold -> zip calls reuse keep-alive connections
+    instead of opening a fresh TCP/TLS connection each.
+    """
+    s = requests.Session()
+    # Retry only covers connect errors / idempotent methods; POSTs are never resent
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, backoff_factor=0.2),
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
 
 # =========================================================
 # API Helper
 # =========================================================
-def call_api(
+def api_request(
     method: str, url: str, payload: dict | None = None, timeout: int = DEFAULT_TIMEOUT
-):
+) -> tuple[Any, str | None, Any]:
+    """
+    Returns (json_data, error_message, error_detail); error_message is None on success.
+    Makes no Streamlit calls, so it is safe to run on a worker thread.
+    """
     try:
         if method.upper() == "POST":
-            r = requests.post(url, json=payload, timeout=timeout)
+            r = http_session().post(url, json=payload, timeout=timeout)
         else:
-            r = requests.get(url, timeout=timeout)
+            r = http_session().get(url, timeout=timeout)
 
         if not r.ok:
-            st.error(f"API Error ({r.status_code}) — {url}")
             try:
-                st.code(r.json(), language="json")
+                detail = orjson.loads(r.content)
             except Exception:
-                st.code(r.text)
-            return None
+                detail = r.text
+            return None, f"API Error ({r.status_code}) — {url}", detail
 
         # Some endpoints may return empty response bodies; guard
         try:
-            return r.json()
+            return orjson.loads(r.content), None, None
         except Exception:
-            st.error("API returned non-JSON response.")
-            st.code(r.text)
-            return None
+            return None, "API returned non-JSON response.", r.text
 
     except requests.RequestException as e:
-        st.error(f"Network/API call failed: {e}")
-        return None
+        return None, f"Network/API call failed: {e}", None
+
+
+def show_api_result(result: tuple[Any, str | None, Any]):
+    """Render an api_request() error (main thread only); returns the data or None."""
+    data, error, detail = result
+    if error is None:
+        return data
+    st.error(error)
+    if isinstance(detail, str):
+        st.code(detail)
+    elif detail is not None:
+        st.code(detail, language="json")
+    return None
 
 
 # =========================================================
 # Helpers
 # =========================================================
 def safe_json(obj: Any) -> str:
-    return json.dumps(obj, indent=2, ensure_ascii=False)
+    # orjson (C) is ~50x faster than json.dumps(indent=...) on plan-sized blobs,
+    # which are re-rendered on every rerun; stdlib covers what orjson rejects
+    # (e.g. ints beyond 64 bits)
+    try:
+        return orjson.dumps(
+            obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    except TypeError:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
 
 def mermaid_ink_url(mermaid_code: str) -> str:
-    raw = mermaid_code.encode("utf-8")
-    b64 = base64.b64encode(raw).decode("ascii")
-    return f"https://mermaid.ink/svg/{b64}"
+    # URL-safe alphabet: standard base64 can emit "/", which splits the URL path
+    return "https://mermaid.ink/svg/" + urlsafe_b64encode(
+        mermaid_code.encode("utf-8")
+    ).decode("ascii")
+
+
+# Rendered diagrams, one <sha1 of mermaid source>.svg per distinct diagram
+MERMAID_CACHE_DIR = Path(
+    os.getenv("MERMAID_CACHE_DIR", Path(tempfile.gettempdir()) / "mermaid_cache")
+)
+
+# Keep at most this many SVGs on disk (and in st.cache_data); oldest go first
+MERMAID_CACHE_MAX = int(os.getenv("MERMAID_CACHE_MAX", "256"))
+
+
+def prune_mermaid_cache(max_files: int = MERMAID_CACHE_MAX) -> None:
+    """Trim MERMAID_CACHE_DIR to the max_files most recently written SVGs."""
+    try:
+        svgs = sorted(
+            MERMAID_CACHE_DIR.glob("*.svg"), key=lambda p: p.stat().st_mtime
+        )
+        for p in svgs[: max(len(svgs) - max_files, 0)]:
+            p.unlink()
+    except OSError:
+        pass  # raced with another process's prune
+
+
+@st.cache_data(show_spinner=False, max_entries=MERMAID_CACHE_MAX)
+def render_mermaid_svg(mermaid_code: str) -> str:
+    """
+    SVG markup for a diagram, fetched from mermaid.ink once per distinct source:
+    memoized across reruns (st.cache_data) and on disk across restarts.
+    Raises requests.RequestException if it can't be fetched (errors aren't cached).
+    """
+    digest = hashlib.sha1(mermaid_code.encode("utf-8")).hexdigest()
+    path = MERMAID_CACHE_DIR / f"{digest}.svg"
+    if path.is_file():
+        return path.read_text(encoding="utf-8")
+
+    r = http_session().get(mermaid_ink_url(mermaid_code), timeout=10)
+    r.raise_for_status()
+    svg = r.text
+    try:
+        MERMAID_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(svg, encoding="utf-8")
+        prune_mermaid_cache()
+    except OSError:
+        pass  # read-only FS: the in-process cache still applies
+    return svg
 
 
 def api_post_zip(url: str, payload: dict[str, Any]):
+    """Returns (zip_path, zip_name, None) on success, else (None, None, error_text)."""
     try:
-        r = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
-        if r.status_code != 200:
-            return None, r.text
-        return r, None
-    except requests.RequestException as e:
-        return None, str(e)
+        with http_session().post(
+            url, json=payload, timeout=DEFAULT_TIMEOUT, stream=True
+        ) as r:
+            if r.status_code != 200:
+                return None, None, r.text
+            return save_zip_response(r), guess_zip_filename(r.headers), None
+    except (requests.RequestException, OSError) as e:
+        return None, None, str(e)
+
+
+# Scaffold ZIPs are streamed to a temp file this many bytes at a time
+ZIP_CHUNK = 64 * 1024
+
+# Scaffold ZIPs older than this many seconds belong to abandoned sessions
+ZIP_MAX_AGE = int(os.getenv("SCAFFOLD_ZIP_MAX_AGE", "3600"))
+
+
+@st.cache_resource
+def zip_dir() -> Path:
+    """One private temp dir for this UI process's scaffold ZIPs, removed on exit."""
+    d = Path(tempfile.mkdtemp(prefix="scaffold_zips_"))
+    atexit.register(shutil.rmtree, d, ignore_errors=True)
+    return d
+
+
+def prune_zips(max_age: int = ZIP_MAX_AGE) -> None:
+    """Delete ZIPs that no session has replaced or cleaned up within max_age seconds."""
+    cutoff = time.time() - max_age
+    for p in zip_dir().glob("scaffold_*.zip"):
+        try:
+            if p.stat().st_mtime < cutoff:
+                p.unlink()
+        except OSError:
+            pass  # already gone (its session replaced it meanwhile)
+
+
+def save_zip_response(r: requests.Response) -> str:
+    """Stream a ZIP response body to a temp file (ZIP_CHUNK at a time); returns its path."""
+    prune_zips()
+    f = tempfile.NamedTemporaryFile(
+        prefix="scaffold_", suffix=".zip", dir=zip_dir(), delete=False
+    )
+    try:
+        with f:
+            for chunk in r.iter_content(chunk_size=ZIP_CHUNK):
+                f.write(chunk)
+    except Exception:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+    return f.name
+
+
+def set_latest_zip(path: str | None, name: str | None) -> None:
+    # Only the path lives in session_state; the previous ZIP is unreachable now, drop it
+    old = st.session_state.get("latest_zip_path")
+    if old and old != path:
+        Path(old).unlink(missing_ok=True)
+    st.session_state.latest_zip_path = path
+    st.session_state.latest_zip_name = name
+
+
+def scaffold_for_display(scaffold: dict[str, Any] | None) -> dict[str, Any] | None:
+    """
+    Keep only the scaffold tree for session_state: the page renders just the tree,
+    and the file contents (the bulk of the response) already ship in the ZIP.
+    """
+    if not scaffold or "tree" not in scaffold:
+        return scaffold
+    return {"tree": scaffold["tree"]}
 
 
 def guess_zip_filename(headers: dict[str, str]) -> str:
     cd = headers.get("content-disposition", "") or headers.get(
         "Content-Disposition", ""
     )
-    m = re.search(r'filename="?([^"]+)"?', cd, flags=re.IGNORECASE)
+    m = _CD_FILENAME_RE.search(cd)
     return m.group(1) if m else "generated_project.zip"
 
 
@@ -245,15 +413,19 @@ with col2:
 # =========================================================
 # Session State
 # =========================================================
-for k in [
-    "latest_preview",
-    "latest_plan",
-    "latest_mermaid",
-    "latest_scaffold",
-    "latest_zip_bytes",
-    "latest_zip_name",
-]:
-    st.session_state.setdefault(k, None)
+# Seeded once per browser session; later reruns pay a single flag lookup
+if "_initialized" not in st.session_state:
+    st.session_state.update(
+        {
+            "latest_preview": None,
+            "latest_plan": None,
+            "latest_mermaid": None,
+            "latest_scaffold": None,
+            "latest_zip_path": None,
+            "latest_zip_name": None,
+        }
+    )
+    st.session_state["_initialized"] = True
 
 
 # =========================================================
@@ -289,41 +461,51 @@ if generate_btn:
         st.stop()
 
     idea_payload = build_idea_payload()
-
-    status_box.info("ML Preview...")
-    st.session_state.latest_preview = call_api("POST", PREVIEW_ENDPOINT, idea_payload)
-
-    status_box.info("LLM Agent Plan...")
-    plan = call_api("POST", AGENT_PLAN_ENDPOINT, idea_payload)
-    if not plan:
-        status_box.error("Agent plan failed.")
-        st.stop()
-    st.session_state.latest_plan = plan
-
-    status_box.info("Diagram...")
     diagram_req = {
         "idea": idea_payload,
         "diagram_type": diagram_type,
         "title": idea_payload["name"],
     }
-    diagram = call_api("POST", DIAGRAM_ENDPOINT, diagram_req)
-    st.session_state.latest_mermaid = extract_mermaid(diagram) if diagram else None
 
-    status_box.info("Scaffold...")
-    scaffold_req = {
-        "idea": idea_payload,
-        "plan": plan,
-        "project_slug": "generated_project",
-        "include_docker": include_docker,
-        "include_github_actions": include_github_actions,
-    }
-    st.session_state.latest_scaffold = call_api("POST", SCAFFOLD_ENDPOINT, scaffold_req)
+    # Only scaffold/zip need the plan: preview, plan and diagram go out together,
+    # then scaffold + zip as soon as the plan is back (sharing the pooled session)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        status_box.info("ML Preview, LLM Agent Plan & Diagram...")
+        preview_f = pool.submit(api_request, "POST", PREVIEW_ENDPOINT, idea_payload)
+        plan_f = pool.submit(api_request, "POST", AGENT_PLAN_ENDPOINT, idea_payload)
+        diagram_f = pool.submit(api_request, "POST", DIAGRAM_ENDPOINT, diagram_req)
+
+        plan = show_api_result(plan_f.result())
+        if not plan:
+            st.session_state.latest_preview = show_api_result(preview_f.result())
+            status_box.error("Agent plan failed.")
+            st.stop()
+        st.session_state.latest_plan = plan
+
+        status_box.info("Scaffold & ZIP...")
+        scaffold_req = {
+            "idea": idea_payload,
+            "plan": plan,
+            "project_slug": "generated_project",
+            "include_docker": include_docker,
+            "include_github_actions": include_github_actions,
+        }
+        scaffold_f = pool.submit(api_request, "POST", SCAFFOLD_ENDPOINT, scaffold_req)
+        zip_f = pool.submit(api_post_zip, ZIP_ENDPOINT, scaffold_req)
+
+        st.session_state.latest_preview = show_api_result(preview_f.result())
+
+        diagram = show_api_result(diagram_f.result())
+        st.session_state.latest_mermaid = extract_mermaid(diagram) if diagram else None
+
+        st.session_state.latest_scaffold = scaffold_for_display(
+            show_api_result(scaffold_f.result())
+        )
+
+        zip_path, zip_name, zip_err = zip_f.result()
 
-    status_box.info("ZIP...")
-    zip_resp, zip_err = api_post_zip(ZIP_ENDPOINT, scaffold_req)
-    if zip_resp:
-        st.session_state.latest_zip_bytes = zip_resp.content
-        st.session_state.latest_zip_name = guess_zip_filename(zip_resp.headers)
+    if zip_path:
+        set_latest_zip(zip_path, zip_name)
         status_box.success("✅ Done")
     else:
         st.error(zip_err)
@@ -353,9 +535,13 @@ st.divider()
 
 st.subheader("Mermaid Diagram")
 if st.session_state.latest_mermaid:
-    st.components.v1.iframe(
-        mermaid_ink_url(st.session_state.latest_mermaid), height=520, scrolling=True
-    )
+    try:
+        st.image(render_mermaid_svg(st.session_state.latest_mermaid))
+    except requests.RequestException:
+        # mermaid.ink unreachable from the server: let the browser try directly
+        st.components.v1.iframe(
+            mermaid_ink_url(st.session_state.latest_mermaid), height=520, scrolling=True
+        )
 else:
     st.info("No diagram yet.")
 
@@ -372,10 +558,12 @@ with l2:
 
 with r2:
     st.subheader("Download ZIP")
-    if st.session_state.latest_zip_bytes:
+    zip_path = st.session_state.latest_zip_path
+    if zip_path and Path(zip_path).is_file():
         st.download_button(
             "Download Project ZIP",
-            data=st.session_state.latest_zip_bytes,
+            # Deferred: the file is read only when the button is clicked
+            data=Path(zip_path).read_bytes,
             file_name=st.session_state.latest_zip_name or "project.zip",
             mime="application/zip",
             use_container_width=True,